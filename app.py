@@ -2,11 +2,14 @@ import streamlit as st
 from datetime import datetime
 import json
 import time
-from src.rag import RAG
+from src.rag import RAG, coalesce_chunks
 import pandas as pd
 import re
 from io import StringIO
 import io
+import uuid
+
+MAX_STORED_MESSAGES = 100
 
 
 # Page configuration - MUST BE FIRST
@@ -237,6 +240,8 @@ if "total_queries" not in st.session_state:
     st.session_state.total_queries = 0
 if "session_start" not in st.session_state:
     st.session_state.session_start = datetime.now()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "welcome_shown" not in st.session_state: 
     st.session_state.welcome_shown = False
 
@@ -526,10 +531,18 @@ if question:
             
             try:
             
-                for chunk in rag_system.rag_streaming(question, st.session_state.chat_history, top_k=15):
-                    full_response += chunk
-                    response_placeholder.markdown(full_response + "▌")
+                # Redraw at most every 50 ms instead of once per token
+                parts = []
+                stream = rag_system.rag_streaming(
+                    question, st.session_state.chat_history, top_k=15,
+                    session_id=st.session_state.session_id,
+                    on_wait=lambda position: response_placeholder.markdown(f"⏳ High demand right now, you are #{position} in the queue..."),
+                )
+                for update in coalesce_chunks(stream):
+                    parts.append(update)
+                    response_placeholder.markdown("".join(parts) + "▌")
                 
+                full_response = "".join(parts)
                 response_placeholder.markdown(full_response)
                 
                 # Add assistant response
@@ -545,6 +558,10 @@ if question:
                     "role": "assistant", 
                     "content": error_msg
                 })
+
+    # Keep the session's history bounded; the LLM only sees the token-bounded view from rag_system.memory
+    if len(st.session_state.chat_history) > MAX_STORED_MESSAGES:
+        st.session_state.chat_history = st.session_state.chat_history[-MAX_STORED_MESSAGES:]
 # Floating action button for scrolling to top
 if len(st.session_state.chat_history) > 5:
     st.markdown("""
@@ -6,6 +6,7 @@ import logging
 from src.processCirculars import CircularsFetchProcess
 from src.qdrant import QdrantManager
 from src.embedding import EmbedContent
+from src.vectorstore import BACKENDS, uses_server
 import argparse
 
 log_path = Path.cwd() / 'logs'
@@ -17,6 +18,10 @@ def get_args():
     parser = argparse.ArgumentParser(description='Run multiple scripts with arguments')
     parser.add_argument('--start', default=dt.today().strftime("%d-%m-%Y"),help='start date for to download circulars')
     parser.add_argument('--save_path', default='./data',help='Folder to save circulars')
+    parser.add_argument('--backend', default=None,choices=BACKENDS,help='Qdrant backend: Docker server, embedded on-disk (local) or in-memory (defaults to QDRANT_BACKEND or server)')
+    parser.add_argument('--partition', default=None,choices=['month','quarter','none'],help='Time partitioning of collections (defaults to QDRANT_PARTITION or month)')
+    parser.add_argument('--profile', default=None,help='Collection storage profile used when the collection is first created (see src/profiles.py)')
+    parser.add_argument('--no_warmup', action='store_true',help='Skip running the warm-up questions after embedding (see src/warmup.py)')
     return parser.parse_args()
     
 
@@ -32,13 +37,21 @@ def main():
         print()
 
 
-        qobj = QdrantManager()
-        qobj.start_docker_service()
-        logging.info("Docker started successfully")
-        qobj.start()
-        print()
+        # Embedded backends run inside this process, no Docker needed
+        if uses_server(args.backend):
+            qobj = QdrantManager()
+            if not qobj.start_docker_service():
+                logger.error("Error: Docker daemon is not reachable")
+                sys.exit(1)
+            logging.info("Docker started successfully")
+            if qobj.start() is None:
+                logger.error("Error: Qdrant did not become ready")
+                sys.exit(1)
+            qobj.warm_up()
+            logging.info("Qdrant ready")
+            print()
 
-        embdob = EmbedContent(folder=args.save_path)
+        embdob = EmbedContent(folder=args.save_path,profile=args.profile,partition=args.partition,backend=args.backend,warmup=not args.no_warmup)
         embdob.embedData()
         logging.info("Embedded pdf content successfully")
     else:
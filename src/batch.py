@@ -0,0 +1,67 @@
+import os
+import json
+import logging
+import argparse
+from datetime import datetime as dt
+from dotenv import load_dotenv
+from src.rag import RAG
+from src.vectorstore import BACKENDS
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def load_questions(path):
+    """One question per line (blank lines and # comments skipped), or a JSON list of strings."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        return [q.strip() for q in json.loads(text) if q.strip()]
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith("#")]
+
+
+def write_jsonl(answers, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for answer in answers:
+            f.write(json.dumps(answer, ensure_ascii=False) + "\n")
+
+
+def write_markdown(answers, path, title=None):
+    title = title or f"NSE Circulars Digest - {dt.now().strftime('%B %d, %Y')}"
+    parts = [f"# {title}\n"]
+    for idx, answer in enumerate(answers, 1):
+        parts.append(f"## {idx}. {answer['question']}\n")
+        parts.append(answer["answer"].strip() + "\n")
+        sources = []
+        for source in answer["sources"]:
+            if "symbol" in source:
+                sources.append(f"- {source['symbol']}: {source.get('subject') or 'N/A'} (ex-date {source.get('exDate') or 'N/A'})")
+            else:
+                sources.append(f"- {source.get('subject') or source.get('id')} ({source.get('date') or 'N/A'}) {source.get('link') or ''}".rstrip())
+        if sources:
+            parts.append("**Sources**\n\n" + "\n".join(sources) + "\n")
+        if answer["degraded"]:
+            parts.append(f"_Degraded: {', '.join(d['stage'] for d in answer['degraded'])}_\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a fixed list of questions in one batch and write a digest")
+    parser.add_argument("--questions", type=str, required=True, help="Text file with one question per line, or a JSON list")
+    parser.add_argument("--out", type=str, default=None, help="Output path prefix, writes <out>.jsonl and <out>.md")
+    parser.add_argument("--top_k", type=int, default=15)
+    parser.add_argument("--concurrency", type=int, default=4, help="Answers generated at the same time")
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    questions = load_questions(args.questions)
+    out = args.out or os.path.join("digests", f"digest_{dt.now().strftime('%Y-%m-%d')}")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+
+    rag = RAG(backend=args.backend)
+    answers = rag.answer_batch(questions, top_k=args.top_k, concurrency=args.concurrency)
+    write_jsonl(answers, f"{out}.jsonl")
+    write_markdown(answers, f"{out}.md")
+    print(f"Wrote {len(answers)} answers to {out}.jsonl and {out}.md")
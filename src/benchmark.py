@@ -0,0 +1,288 @@
+import argparse
+import json
+import time
+import logging
+import tempfile
+import shutil
+import numpy as np
+from tqdm.auto import tqdm
+from qdrant_client import models
+from src.profiles import COLLECTION_PROFILES, DENSE_VECTOR, DENSE_SIZE, DOC_TYPE_FIELD, PAYLOAD_SCHEMA, get_profile, collection_params, search_params
+from src.partitions import BASE_COLLECTION, PartitionScheme
+from src.vectorstore import BACKENDS, get_client, close_client
+from src.dateintent import DateIntentParser
+
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+BENCH_PREFIX = f"{BASE_COLLECTION}-bench"
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def estimate_memory(profile_name, n_points, payload_bytes):
+    """
+    Estimate the RAM held by a collection for a given profile.
+
+    Qdrant does not report per-collection memory, so this adds up the parts that
+    stay resident: original vectors (unless on disk), quantized vectors, HNSW
+    links (2*m per point on layer 0, for the global graph and the point's
+    tenant graph) and payload (unless on disk).
+    """
+    profile = get_profile(profile_name)
+    bytes_per_dim = 2 if profile.get("datatype") == "float16" else 4
+    ram = 0
+    if not profile.get("on_disk"):
+        ram += n_points * DENSE_SIZE * bytes_per_dim
+    if profile.get("quantization") == "int8":
+        ram += n_points * DENSE_SIZE
+    elif profile.get("quantization") == "binary":
+        ram += n_points * DENSE_SIZE // 8
+    ram += n_points * 2 * (profile.get("hnsw_m", 0) + profile.get("hnsw_payload_m", 16)) * 4
+    if not profile.get("on_disk_payload"):
+        ram += payload_bytes
+    return ram
+
+
+def load_source_points(client, collection_name, batch=256):
+    points = []
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        points.extend(records)
+        if offset is None:
+            break
+    return points
+
+
+def wait_for_index(client, collection_name, timeout=600):
+    start = time.time()
+    while time.time() - start < timeout:
+        info = client.get_collection(collection_name)
+        if info.status == models.CollectionStatus.GREEN:
+            return True
+        time.sleep(1)
+    logger.warning(f"{collection_name} did not finish indexing in {timeout}s")
+    return False
+
+
+def copy_into_profile(client, points, profile_name, collection_name, batch=256):
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(collection_name=collection_name, **collection_params(profile_name))
+    # The tenant index is what the per-doc_type HNSW graphs are built on
+    client.create_payload_index(collection_name=collection_name, field_name=DOC_TYPE_FIELD,
+                                field_schema=PAYLOAD_SCHEMA[DOC_TYPE_FIELD], wait=True)
+    for start in tqdm(range(0, len(points), batch), desc=f"Loading {profile_name}"):
+        client.upsert(
+            collection_name=collection_name,
+            points=[
+                models.PointStruct(id=p.id, vector=p.vector, payload=p.payload)
+                for p in points[start:start + batch]
+            ],
+            wait=True,
+        )
+    wait_for_index(client, collection_name)
+
+
+def tenant_filter(point):
+    """Queries are scoped to the sampled point's doc_type, like every search RAG makes."""
+    doc_type = point.payload.get(DOC_TYPE_FIELD)
+    if not doc_type:
+        return None
+    return models.Filter(must=[models.FieldCondition(key=DOC_TYPE_FIELD, match=models.MatchValue(value=doc_type))])
+
+
+def run_queries(client, collection_name, queries, k, params, filters=None):
+    latencies, results = [], []
+    for i, vector in enumerate(queries):
+        start = time.perf_counter()
+        res = client.query_points(
+            collection_name=collection_name,
+            query=vector,
+            using=DENSE_VECTOR,
+            limit=k,
+            search_params=params,
+            query_filter=filters[i] if filters else None,
+            with_payload=False,
+        )
+        latencies.append(time.perf_counter() - start)
+        results.append([p.id for p in res.points])
+    return latencies, results
+
+
+def recall_at_k(results, truth, k):
+    hits = sum(len(set(r[:k]) & set(t[:k])) for r, t in zip(results, truth))
+    return hits / max(1, sum(min(k, len(t)) for t in truth))
+
+
+def benchmark_profiles(client, profiles, n_queries=100, k=10, keep=False, seed=0):
+    """
+    Copy the live collection into one collection per profile and compare them.
+
+    All partitions are merged into each copy. Query vectors are sampled from the
+    stored dense vectors; ground truth is an exact (brute force) search on the
+    float32 copy.
+    """
+    points = []
+    for target in PartitionScheme().resolve(client):
+        points.extend(load_source_points(client, target))
+    if not points:
+        logger.error(f"No points found in {BASE_COLLECTION}")
+        return []
+    payload_bytes = sum(len(json.dumps(p.payload)) for p in points)
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(points), size=min(n_queries, len(points)), replace=False)
+    queries = [points[i].vector[DENSE_VECTOR] for i in sample]
+    filters = [tenant_filter(points[i]) for i in sample]
+
+    baseline = f"{BENCH_PREFIX}-baseline"
+    copy_into_profile(client, points, "float32", baseline)
+    _, truth = run_queries(client, baseline, queries, k, models.SearchParams(exact=True), filters)
+
+    report = []
+    for profile_name in profiles:
+        collection_name = f"{BENCH_PREFIX}-{profile_name}"
+        copy_into_profile(client, points, profile_name, collection_name)
+        latencies, results = run_queries(client, collection_name, queries, k, search_params(profile_name), filters)
+        report.append({
+            "profile": profile_name,
+            "points": len(points),
+            "est_ram_mb": round(estimate_memory(profile_name, len(points), payload_bytes) / 2**20, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            f"recall@{k}": round(recall_at_k(results, truth, k), 4),
+        })
+        if not keep:
+            client.delete_collection(collection_name)
+    if not keep:
+        client.delete_collection(baseline)
+    return report
+
+
+def benchmark_backends(client, backends=("memory", "local"), n_queries=100, k=10, seed=0):
+    """
+    Load the live data into embedded (qdrant-client local mode) backends and compare
+    them with `client`: search latency and overlap@k with the source results, which
+    should be ~1.0 for a backend that behaves the same.
+    """
+    points = []
+    for target in PartitionScheme().resolve(client):
+        points.extend(load_source_points(client, target))
+    if not points:
+        logger.error(f"No points found in {BASE_COLLECTION}")
+        return []
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(points), size=min(n_queries, len(points)), replace=False)
+    queries = [points[i].vector[DENSE_VECTOR] for i in sample]
+    filters = [tenant_filter(points[i]) for i in sample]
+
+    baseline = f"{BENCH_PREFIX}-baseline"
+    copy_into_profile(client, points, "float32", baseline)
+    latencies, truth = run_queries(client, baseline, queries, k, None, filters)
+    report = [{
+        "backend": "source",
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        f"overlap@{k}": 1.0,
+    }]
+    client.delete_collection(baseline)
+
+    for backend in backends:
+        folder = tempfile.mkdtemp() if backend == "local" else None
+        embedded = get_client(backend, path=folder)
+        copy_into_profile(embedded, points, "float32", baseline)
+        latencies, results = run_queries(embedded, baseline, queries, k, None, filters)
+        report.append({
+            "backend": backend,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            f"overlap@{k}": round(recall_at_k(results, truth, k), 4),
+        })
+        embedded.delete_collection(baseline)
+        if folder:
+            close_client(embedded)
+            shutil.rmtree(folder, ignore_errors=True)
+    return report
+
+
+DATE_QUERIES = [
+    "List all corporate actions in next 3 days",
+    "Recent SEBI regulations on derivatives",
+    "What is the T+1 settlement cycle implementation?",
+    "Latest circular on mutual funds",
+    "Dividends with ex-date on 15 Nov",
+    "Circulars issued on 03-11-2025",
+    "Corporate actions this week",
+    "Trading holidays next month",
+    "Changes to margin requirements",
+    "Bonus issues announced last 10 days",
+]
+
+
+def benchmark_date_parsing(queries=DATE_QUERIES, repeat=20):
+    """Per-query time of the rule-based parser (with its lazy fallback) vs dateparser.search_dates."""
+    from dateparser.search import search_dates
+    parser = DateIntentParser()
+    # Warm both paths so one-off imports and locale loading aren't counted
+    for query in queries:
+        parser.parse(query)
+        search_dates(query)
+
+    report = []
+    for name, fn in (("dateparser", search_dates), ("rules+fallback", parser.parse)):
+        timings = []
+        for _ in range(repeat):
+            for query in queries:
+                start = time.perf_counter()
+                fn(query)
+                timings.append(time.perf_counter() - start)
+        report.append({
+            "parser": name,
+            "mean_ms": round(float(np.mean(timings)) * 1000, 3),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+        })
+    return report
+
+
+def print_report(report):
+    if not report:
+        return
+    columns = list(report[0].keys())
+    widths = [max(len(c), *(len(str(r[c])) for r in report)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in report:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark collection storage profiles against the float32 baseline")
+    parser.add_argument("--profiles", nargs="+", default=list(COLLECTION_PROFILES), choices=list(COLLECTION_PROFILES))
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark collections")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="Backend holding the source data")
+    parser.add_argument("--compare_backends", action="store_true", help="Compare embedded backends with the source instead of profiles")
+    parser.add_argument("--dates", action="store_true", help="Microbenchmark query date parsing (no Qdrant needed)")
+    args = parser.parse_args()
+
+    if args.dates:
+        print_report(benchmark_date_parsing())
+        raise SystemExit(0)
+
+    client = get_client(args.backend)
+    if args.compare_backends:
+        print_report(benchmark_backends(client, n_queries=args.queries, k=args.k))
+    else:
+        print_report(benchmark_profiles(client, args.profiles, n_queries=args.queries, k=args.k, keep=args.keep))
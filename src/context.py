@@ -0,0 +1,221 @@
+import os
+import re
+import threading
+import logging
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 6000
+CHARS_PER_TOKEN = 4
+# Shorter lines (numbers, table cells, "Sr. No.") legitimately repeat and are never deduplicated
+MIN_DEDUP_LINE = 40
+# A single page (long annexure tables) may use at most this share of the budget
+MAX_PAGE_SHARE = 0.25
+SEPARATOR = "=" * 60
+
+
+def count_tokens(text):
+    """Provider-agnostic token estimate (~4 characters per token for English/markdown)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def cut_line(line, tokens):
+    """Longest prefix of `line` within `tokens`, ending at a word boundary when there is one nearby."""
+    limit = max(0, tokens) * CHARS_PER_TOKEN
+    if len(line) <= limit:
+        return line
+    cut = line[:limit]
+    space = cut.rfind(" ")
+    return cut[:space] if space > limit // 2 else cut
+
+
+def fingerprint(text):
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+
+class ContextPacker:
+    """
+    Packs search results into a prompt context under a token budget.
+
+    Results are grouped per circular (metadata written once, even when it has
+    several documents) or per corporate action. Groups are added in order of
+    retrieval score, pages in page order. Paragraphs, tables and long lines
+    (letterheads, disclaimers) already packed are dropped. The last page that
+    doesn't fit, or any page above MAX_PAGE_SHARE of the budget, is cut at a
+    line boundary (inside the line when a single line is too long), and groups
+    whose header no longer fits are skipped.
+    """
+    def __init__(self, budget=None):
+        self.budget = budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_BUDGET))
+        self.page_budget = int(self.budget * MAX_PAGE_SHARE)
+        self.lock = threading.Lock()
+        self.prompt_tokens = deque(maxlen=1000)
+
+    def group(self, search_results):
+        groups = {}
+        for item in search_results:
+            if 'symbol' in item:
+                key = f"Corporate Action: {item.get('symbol', 'N/A')}"
+            else:
+                key = item.get('id') or item.get('circFilelink') or item.get('document_name') or "Unknown Document Type"
+            groups.setdefault(key, []).append(item)
+        return sorted(groups.items(), key=lambda g: max(i.get("score", 0.0) for i in g[1]), reverse=True)
+
+    def header(self, idx, key, first_item):
+        if 'symbol' in first_item:
+            return "\n".join([
+                f"=== DOCUMENT {idx}: {key} ===\n",
+                f"Symbol: {first_item.get('symbol', 'N/A')}",
+                f"Series: {first_item.get('series', 'N/A')}",
+                f"Face Value: {first_item.get('faceVal', 'N/A')}",
+                f"Subject: {first_item.get('subject', 'N/A')}",
+                f"Ex-Date: {first_item.get('exDate', 'N/A')}",
+                f"Company: {first_item.get('comp', 'N/A')}",
+                "",
+            ])
+        if 'content' in first_item:
+            return "\n".join([
+                f"=== DOCUMENT {idx}: {first_item.get('document_name', key)} ===\n",
+                f"Subject: {first_item.get('sub', 'N/A')}",
+                f"Date: {first_item.get('cirDisplayDate', 'N/A')}",
+                f"File Link: {first_item.get('circFilelink', 'N/A')}",
+                f"Department: {first_item.get('circDepartment', 'N/A')}",
+                f"Category: {first_item.get('circCategory', 'N/A')}",
+                "\nContent:",
+            ])
+        return f"=== DOCUMENT {idx}: {key} ===\n\nNo structured content found for this document.\n"
+
+    def dedupe(self, content, seen):
+        """Page content without paragraphs/tables (and long lines) already packed; returns (text, dropped)."""
+        kept, dropped = [], 0
+        for block in re.split(r"\n\s*\n", content.strip()):
+            block_key = fingerprint(block)
+            if not block_key or block_key in seen:
+                dropped += bool(block_key)
+                continue
+            lines = []
+            for line in block.splitlines():
+                line_key = fingerprint(line)
+                if len(line_key) >= MIN_DEDUP_LINE:
+                    if line_key in seen:
+                        dropped += 1
+                        continue
+                    seen.add(line_key)
+                lines.append(line)
+            # Marked after its lines, or a one-line block would count as a duplicate of itself
+            seen.add(block_key)
+            if lines:
+                kept.append("\n".join(lines))
+        return "\n\n".join(kept), dropped
+
+    def truncate(self, text, tokens):
+        lines, used = [], 0
+        for line in text.splitlines():
+            cost = count_tokens(line + "\n")
+            if used + cost > tokens:
+                # Keep the part that fits; pages that are one long line (flattened tables) aren't dropped
+                cut = cut_line(line, tokens - used - 1)
+                if cut.strip():
+                    lines.append(cut)
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(lines)
+
+    def pack(self, search_results):
+        """
+        Returns:
+            tuple: (context string, stats dict with token counts and what was dropped)
+        """
+        parts, seen = [], set()
+        used = 0
+        stats = {"budget": self.budget, "groups": 0, "pages": 0, "pages_dropped": 0,
+                 "duplicates_dropped": 0, "truncated": False}
+
+        for key, items in self.group(search_results):
+            header = self.header(stats["groups"] + 1, key, items[0])
+            cost = count_tokens(header + SEPARATOR) + 2
+            if used + cost > self.budget:
+                stats["pages_dropped"] += sum(1 for i in items if 'content' in i)
+                continue
+            group_parts = [header]
+            used += cost
+            stats["groups"] += 1
+
+            if 'content' in items[0]:
+                document = items[0].get('document_name')
+                for page in items:
+                    text, dropped = self.dedupe(page.get('content', ''), seen)
+                    stats["duplicates_dropped"] += dropped
+                    if not text:
+                        continue
+                    if page.get('document_name') != document:
+                        document = page.get('document_name')
+                        text = f"--- {document} ---\n{text}"
+                    label = f"\n[Page {page.get('page_number', '?')}]" if len(items) > 1 else ""
+                    block = f"{label}\n{text}"
+                    cost = count_tokens(block) + 1
+                    if cost > self.page_budget or used + cost > self.budget:
+                        block = self.truncate(block, min(self.page_budget, self.budget - used))
+                        if not block.strip():
+                            stats["pages_dropped"] += 1
+                            continue
+                        stats["truncated"] = True
+                        cost = count_tokens(block) + 1
+                    group_parts.append(block)
+                    used += cost
+                    stats["pages"] += 1
+
+            group_parts.append(f"\n{SEPARATOR}\n")
+            parts.append("\n".join(group_parts))
+
+        context = "\n".join(parts)
+        stats["context_tokens"] = count_tokens(context)
+        return context, stats
+
+    def record(self, prompt_tokens):
+        with self.lock:
+            self.prompt_tokens.append(prompt_tokens)
+
+    def stats(self):
+        with self.lock:
+            tokens = list(self.prompt_tokens)
+            return {
+                "budget": self.budget,
+                "prompts": len(tokens),
+                "prompt_tokens_p50": int(np.percentile(tokens, 50)) if tokens else 0,
+                "prompt_tokens_p99": int(np.percentile(tokens, 99)) if tokens else 0,
+            }
+
+
+class TokenUsage:
+    """Provider-reported prompt/cached/completion tokens, to check how much of each prompt hits the prefix cache."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, usage):
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.cached_tokens += cached
+            self.completion_tokens += usage.completion_tokens or 0
+        logger.info(f"LLM usage: prompt={usage.prompt_tokens} cached={cached} completion={usage.completion_tokens}")
+        return cached
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            }
@@ -0,0 +1,139 @@
+import re
+from datetime import datetime as dt, timedelta
+from pandas.tseries.offsets import BDay
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+MONTH_NAMES = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+
+RECENT = re.compile(r"\b(latest|recent|new)\b")
+NEXT = re.compile(r"\bnext\s+(?:(\d+)\s+days?|week|month)\b")
+PAST = re.compile(r"\b(?:last|past|previous)\s+(?:(\d+)\s+days?|week|month)\b")
+THIS = re.compile(r"\bthis\s+(week|month)\b")
+RELATIVE_DAY = re.compile(r"\b(today|tomorrow|yesterday)\b")
+NUMERIC_DMY = re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})\b")
+NUMERIC_YMD = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+DAY_MONTH = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?{MONTH_NAMES}\.?(?:,?\s+(\d{{4}}))?\b")
+MONTH_DAY = re.compile(rf"\b{MONTH_NAMES}\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?\b")
+# Anything dateparser could still make sense of; queries without these skip the fallback.
+# A bare "may" is usually the verb ("may I know..."); "May 15" still counts through its digits
+DATE_HINT = re.compile(rf"\d|\b{MONTH_NAMES.replace('may|', '')}\b|\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday|ago|week|month|year)\b")
+
+
+def midnight(date):
+    return date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def check_bday(date):
+    """Check if the date is business day or not . If not then add 1 day"""
+    if not BDay().is_on_offset(date):
+        date += BDay(1)
+    return date
+
+
+class DateIntentParser:
+    """
+    Rule-based date intent parser for questions.
+
+    Resolves "latest", "next N days/week/month", "last/past N days", "this
+    week/month", today/tomorrow/yesterday and explicit dates (DD-MM-YYYY,
+    YYYY-MM-DD, "15 Nov", "Nov 15, 2025") with precompiled patterns. Only when
+    none match and the text still looks date-like is dateparser imported and
+    run. `parse` returns {"start", "end", "exact"} as ISO strings (or None).
+    """
+    def __init__(self, fallback=True):
+        self.fallback = fallback
+        self.search_dates = None
+
+    def month(self, name):
+        return MONTHS[name[:3]]
+
+    def build(self, start=None, end=None, exact=None):
+        if exact is not None:
+            exact = check_bday(midnight(exact)).isoformat()
+            return {"start": exact, "end": exact, "exact": exact}
+        if start is not None and end is not None:
+            return {"start": start.isoformat(), "end": end.isoformat(), "exact": None}
+        return {"start": None, "end": None, "exact": None}
+
+    def ranges(self, text, today):
+        if RECENT.search(text):
+            return self.build(today - timedelta(days=15), today)
+
+        match = NEXT.search(text)
+        if match:
+            start = today + timedelta(days=1)
+            if match.group(1):  # "next X days"
+                end = start + timedelta(days=int(match.group(1)))
+            elif "week" in match.group(0):  # "next week"
+                start = start + timedelta(days=(7 - start.weekday()) % 7 or 7)
+                end = start + timedelta(days=6)
+            else:  # "next month"
+                start = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+                end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            return self.build(start, check_bday(end))
+
+        match = PAST.search(text)
+        if match:
+            if match.group(1):
+                days = int(match.group(1))
+            else:
+                days = 7 if "week" in match.group(0) else 30
+            return self.build(today - timedelta(days=days), today)
+
+        match = THIS.search(text)
+        if match:
+            if match.group(1) == "week":
+                start = today - timedelta(days=today.weekday())
+                return self.build(start, start + timedelta(days=6))
+            start = today.replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            return self.build(start, end)
+        return None
+
+    def explicit(self, text, today):
+        match = RELATIVE_DAY.search(text)
+        if match:
+            offset = {"today": 0, "tomorrow": 1, "yesterday": -1}[match.group(1)]
+            return today + timedelta(days=offset)
+        try:
+            match = NUMERIC_DMY.search(text)
+            if match:
+                return dt(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+            match = NUMERIC_YMD.search(text)
+            if match:
+                return dt(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            match = DAY_MONTH.search(text)
+            if match:
+                year = int(match.group(3)) if match.group(3) else today.year
+                return dt(year, self.month(match.group(2)), int(match.group(1)))
+            match = MONTH_DAY.search(text)
+            if match:
+                year = int(match.group(3)) if match.group(3) else today.year
+                return dt(year, self.month(match.group(1)), int(match.group(2)))
+        except ValueError:  # e.g. 31 Feb
+            return None
+        return None
+
+    def parse(self, query, today=None):
+        text = query.lower()
+        today = midnight(today or dt.today())
+
+        resolved = self.ranges(text, today)
+        if resolved:
+            return resolved
+
+        date = self.explicit(text, today)
+        if date:
+            return self.build(exact=date)
+
+        if self.fallback and DATE_HINT.search(text):
+            if self.search_dates is None:
+                from dateparser.search import search_dates
+                self.search_dates = search_dates
+            found = self.search_dates(query)
+            if found:
+                return self.build(exact=found[0][1])
+        return self.build()
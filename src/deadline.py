@@ -0,0 +1,51 @@
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 20.0
+# Share of the request budget each stage may use before its fallback kicks in;
+# generation (time to first token) gets whatever is left
+STAGE_SHARES = {
+    "date_parsing": 0.03,
+    "partitions": 0.05,
+    "encoding": 0.12,
+    "search": 0.2,
+    "expansion": 0.1,
+}
+
+
+class Deadline:
+    """
+    Latency budget of one request, split across its stages.
+
+    `timeout(stage)` is the stage's share of the budget, capped by what is
+    left overall. Stages that run out of time call `degrade` and continue
+    on their fallback. `report` logs the degraded stages once per request.
+    """
+    def __init__(self, budget=None):
+        self.budget = budget if budget is not None else float(os.getenv("REQUEST_BUDGET", DEFAULT_BUDGET))
+        self.start = time.monotonic()
+        self.degraded = []
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        return max(0.0, self.budget - self.elapsed())
+
+    def timeout(self, stage):
+        share = STAGE_SHARES.get(stage)
+        if share is None:
+            return self.remaining()
+        return min(self.remaining(), share * self.budget)
+
+    def degrade(self, stage, fallback, reason="timeout"):
+        self.degraded.append({"stage": stage, "fallback": fallback, "reason": reason, "at_s": round(self.elapsed(), 3)})
+        logger.warning(f"Stage {stage} degraded ({reason}) after {self.elapsed():.2f}s, falling back to {fallback}")
+
+    def report(self, query):
+        if self.degraded:
+            logger.warning(f"Degraded request '{query[:80]}' in {self.elapsed():.2f}s: {self.degraded}")
+        return self.degraded
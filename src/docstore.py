@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "./data/docstore.sqlite"
+
+
+def docstore_path():
+    """DOCSTORE_PATH, shared by ingestion, the app/service and snapshots."""
+    return os.getenv("DOCSTORE_PATH", DEFAULT_PATH)
+
+
+def make_page_key(circular_id, document_name, page_number):
+    return f"{circular_id}:{document_name}:{page_number}"
+
+
+class DocStore:
+    """
+    Local SQLite store for circular metadata and page text.
+
+    Qdrant page points only carry filterable fields plus a `page_key`; the
+    circular metadata (stored once per circular) and the page content live
+    here and are merged back into search results by `hydrate`.
+    """
+    def __init__(self, path=None):
+        self.path = path or docstore_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS circulars (
+                    id TEXT PRIMARY KEY,
+                    meta TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    page_key TEXT PRIMARY KEY,
+                    circular_id TEXT NOT NULL,
+                    content TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    answer TEXT NOT NULL,
+                    created REAL NOT NULL
+                );
+            """)
+
+    def connect(self):
+        # One connection per thread; RAG searches run on a thread pool
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def put(self, circulars, pages):
+        """
+        Args:
+            circulars (list): (circular_id, metadata dict) tuples.
+            pages (list): (page_key, circular_id, content) tuples.
+        """
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO circulars (id, meta) VALUES (?, ?)",
+                [(cid, json.dumps(meta)) for cid, meta in circulars],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages (page_key, circular_id, content) VALUES (?, ?, ?)",
+                pages,
+            )
+        logger.info(f"Stored {len(circulars)} circulars and {len(pages)} pages in {self.path}")
+
+    def get_version(self):
+        """Collection version, bumped by every ingestion run; used to invalidate answer caches."""
+        row = self.connect().execute("SELECT value FROM meta WHERE key = 'collection_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def bump_version(self):
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('collection_version', '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            # Stored answers were computed against the previous data
+            conn.execute(
+                "DELETE FROM answers WHERE version < (SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'collection_version')"
+            )
+        return self.get_version()
+
+    def put_answer(self, key, version, answer):
+        """Answers shared across processes (app, service workers, warm-up run), keyed like the in-memory answer cache."""
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, version, answer, created) VALUES (?, ?, ?, ?)",
+                (json.dumps(key), version, answer, time.time()),
+            )
+
+    def get_answer(self, key, version, ttl):
+        row = self.connect().execute(
+            "SELECT answer FROM answers WHERE key = ? AND version = ? AND created >= ?",
+            (json.dumps(key), version, time.time() - ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def fetch(self, table, column, keys, batch=500):
+        keys = list(dict.fromkeys(k for k in keys if k))
+        rows = {}
+        conn = self.connect()
+        for start in range(0, len(keys), batch):
+            chunk = keys[start:start + batch]
+            placeholders = ",".join("?" * len(chunk))
+            value = "meta" if table == "circulars" else "content"
+            for key, data in conn.execute(
+                f"SELECT {column}, {value} FROM {table} WHERE {column} IN ({placeholders})", chunk
+            ):
+                rows[key] = data
+        return rows
+
+    def hydrate(self, payloads):
+        """
+        Merge stored circular metadata and page content into slim payloads.
+
+        Payloads that already carry `content` (points ingested before the store
+        existed, corporate actions) are returned unchanged.
+        """
+        slim = [p for p in payloads if "page_key" in p and "content" not in p]
+        if not slim:
+            return payloads
+        metas = self.fetch("circulars", "id", [p.get("id") for p in slim])
+        contents = self.fetch("pages", "page_key", [p["page_key"] for p in slim])
+
+        hydrated = []
+        for payload in payloads:
+            if "page_key" in payload and "content" not in payload:
+                meta = json.loads(metas.get(payload.get("id"), "{}"))
+                payload = {**meta, **payload, "content": contents.get(payload["page_key"], "")}
+            hydrated.append(payload)
+        return hydrated
@@ -13,6 +13,11 @@ from pathlib import Path
 import os
 from qdrant_client import QdrantClient, models
 from docker.errors import ImageNotFound, APIError, NotFound
+from src.profiles import DEFAULT_PROFILE, PAYLOAD_SCHEMA, PAGE_PAYLOAD_FIELDS, DOC_TYPE_FIELD, CIRCULAR, CORPORATE_ACTION, collection_params, schema_matches
+from src.partitions import BASE_COLLECTION, PartitionScheme
+from src.docstore import DocStore, make_page_key
+from src.vectorstore import get_client, client_stats
+from collections import defaultdict
 
 log_path = Path.cwd() / 'logs'
 
@@ -21,34 +26,45 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("qdrant_client").setLevel(logging.WARNING)
 
 class EmbedContent:
-    def __init__(self,folder):
-        self.client = QdrantClient("http://localhost:6333")
-        self.collection_name = "nsechatbot-rag-sparse_dense"
+    def __init__(self,folder,profile=None,partition=None,backend=None,warmup=True):
+        self.backend = backend
+        self.client = get_client(backend)
+        self.collection_name = BASE_COLLECTION
         self.folder=folder
-    def createCollection(self):
-        if not self.client.collection_exists(self.collection_name):
-            print(f"Creating Collection with name {self.collection_name}")
+        # Storage profile (see src/profiles.py) only applies when the collection is created
+        self.profile = profile or os.getenv("QDRANT_COLLECTION_PROFILE", DEFAULT_PROFILE)
+        self.partitions = PartitionScheme(base=self.collection_name,period=partition)
+        self.ready_targets = set()
+        # Targets upserted to in this run (ready_targets also holds untouched existing partitions)
+        self.written_targets = set()
+        # Same store the app reads (DOCSTORE_PATH), wherever the circulars are saved
+        self.docstore = DocStore()
+        self.warmup = warmup
+    def createCollection(self,collection_name=None):
+        collection_name = collection_name or self.collection_name
+        if not self.client.collection_exists(collection_name):
+            print(f"Creating Collection with name {collection_name} (profile: {self.profile})")
             self.client.create_collection(
-            collection_name=self.collection_name,
-            vectors_config={
-                    "bge-small-en": models.VectorParams(
-                        size=384,
-                        distance=models.Distance.COSINE,
-                    ),
-                },
-                sparse_vectors_config={
-                    "bm25": models.SparseVectorParams(
-                        modifier=models.Modifier.IDF,
-                    )
-                }
+                collection_name=collection_name,
+                **collection_params(self.profile)
                 ) 
-            logger.info(f"Collection created successfully with the name {self.collection_name}")
+            logger.info(f"Collection created successfully with the name {collection_name}")
         else:
            
-            logger.info(f"Skipping creation of collection since {self.collection_name} already exists")
+            logger.info(f"Skipping creation of collection since {collection_name} already exists")
             
         return True  
 
+    def prepareTarget(self,target):
+        """Create the collection/partition behind `target` (once per run) and sync its indexes."""
+        if target not in self.ready_targets:
+            def create(name):
+                self.createCollection(name)
+                self.createIndex(name)
+            self.partitions.ensure(self.client,target,create)
+            self.ready_targets.add(target)
+        return target
+
     def createPoints(self)->list:
         if os.path.exists(f'{self.folder}/final_processed_circulars.json'):
             with open(f'{self.folder}/final_processed_circulars.json','r') as f:
@@ -59,10 +75,16 @@ class EmbedContent:
             
 
         points=[]
+        stored_circulars,stored_pages = [],[]
        
         model_handle = "BAAI/bge-small-en"
         for circular in circulars_data:
             payload = {k: circular[k] for k in circular.keys() if k != "documents"}
+            circular_id = payload.get("id") or uuid.uuid4().hex
+            # Circular metadata is stored once locally; points only keep the filterable fields
+            stored_circulars.append((circular_id,payload))
+            slim_payload = {k: payload[k] for k in PAGE_PAYLOAD_FIELDS if k in payload}
+            slim_payload["id"] = circular_id
             for doc_entry in circular["documents"]:
                 for filename, pages in doc_entry.items():
                     for page in pages:
@@ -79,7 +101,9 @@ class EmbedContent:
                                 table_texts.append(content + "\n\n")
                                 
                             doc_text = page['page_text'] + "\n" + "".join(table_texts)
-                            page_payload = {**payload,"document_name":filename,'page_number':page_number,"content": doc_text}
+                            page_key = make_page_key(circular_id,filename,page_number)
+                            stored_pages.append((page_key,circular_id,doc_text))
+                            page_payload = {**slim_payload,DOC_TYPE_FIELD:CIRCULAR,"document_name":filename,'page_number':page_number,"page_key":page_key}
                             points.append(
                                 models.PointStruct(
                                     id = uuid.uuid4().hex,
@@ -93,26 +117,80 @@ class EmbedContent:
                                 )
                             )
         
+        self.docstore.put(stored_circulars,stored_pages)
         return points
-    def createIndex(self,circulars=True):
-        if circulars:
-            self.client.create_payload_index(
-                    collection_name=self.collection_name,
-                    field_name="circDepartment",
-                    field_schema="keyword"
+    def createIndex(self,collection_name=None,drop_extra=False):
+        """
+        Sync the collection's payload indexes with PAYLOAD_SCHEMA.
+
+        Missing indexes are created, indexes whose type changed are recreated and
+        (optionally) indexes no longer in the schema are dropped. Indexes that
+        already match are left alone, so repeated runs issue no requests.
+
+        Args:
+            collection_name (str): Collection to sync, defaults to the base collection.
+            drop_extra (bool): Delete live indexes that are not in PAYLOAD_SCHEMA.
+
+        Returns:
+            dict: Field names grouped by the action taken.
+        """
+        collection_name = collection_name or self.collection_name
+        live = self.client.get_collection(collection_name).payload_schema or {}
+        changes = {"created": [], "migrated": [], "dropped": []}
+
+        for field, schema in PAYLOAD_SCHEMA.items():
+            current = live.get(field)
+            if current is not None and schema_matches(current, schema):
+                continue
+            if current is not None:
+                self.client.delete_payload_index(
+                    collection_name=collection_name,
+                    field_name=field,
+                    wait=True
                 )
+                changes["migrated"].append(field)
+            else:
+                changes["created"].append(field)
             self.client.create_payload_index(
-                    collection_name=self.collection_name,
-                    field_name="cirDisplayDate",
-                    field_schema=models.PayloadSchemaType.DATETIME
+                    collection_name=collection_name,
+                    field_name=field,
+                    field_schema=schema,
+                    wait=True
                 )
-        else:
-            self.client.create_payload_index(
-                    collection_name=self.collection_name,
-                    field_name="exDate",
-                    field_schema=models.PayloadSchemaType.DATETIME
+
+        if drop_extra:
+            for field in set(live) - set(PAYLOAD_SCHEMA):
+                self.client.delete_payload_index(
+                    collection_name=collection_name,
+                    field_name=field,
+                    wait=True
                 )
+                changes["dropped"].append(field)
+
+        if any(changes.values()):
+            logger.info(f"Payload index schema updated for {collection_name}: {changes}")
+        else:
+            logger.info(f"Payload index schema already up to date for {collection_name}")
+        return changes
    
+    def backfillDocType(self,collection_name=None):
+        """Tag points ingested before tenants existed: corporate actions carry `symbol`, circulars do not."""
+        collection_name = collection_name or self.collection_name
+        untagged = models.IsEmptyCondition(is_empty=models.PayloadField(key=DOC_TYPE_FIELD))
+        has_symbol = models.IsEmptyCondition(is_empty=models.PayloadField(key="symbol"))
+        self.client.set_payload(
+            collection_name=collection_name,
+            payload={DOC_TYPE_FIELD:CORPORATE_ACTION},
+            points=models.Filter(must=[untagged],must_not=[has_symbol]),
+            wait=True
+        )
+        self.client.set_payload(
+            collection_name=collection_name,
+            payload={DOC_TYPE_FIELD:CIRCULAR},
+            points=models.Filter(must=[untagged,has_symbol]),
+            wait=True
+        )
+
     def createPointsCorpo(self):
         if os.path.exists(f'{self.folder}/corporate_actions_data.json'):
             with open(f'{self.folder}/corporate_actions_data.json','r') as f:
@@ -132,50 +210,93 @@ class EmbedContent:
                         "bge-small-en":models.Document(text=text,model="BAAI/bge-small-en"),
                         "bm25":models.Document(text=text,model="Qdrant/bm25")
                                     },      
-                    payload=data
+                    payload={**data,DOC_TYPE_FIELD:CORPORATE_ACTION}
                 )
             )
         return points
     def upsertPoints(self,points,desc="Embedding the PDF Circulars"):
 
+            # Route every point to the partition of its circular/ex-date
+            targets = defaultdict(list)
+            for point in points:
+                targets[self.partitions.target_for(point.payload)].append(point)
+
             # Batch upsert
             BATCH_SIZE=100
             with tqdm(total=len(points),desc=desc) as progress:
-                for start in range(0, len(points), BATCH_SIZE):
-                    end = start + BATCH_SIZE
-                    batch = points[start:end]
-                    
-                    self.client.upsert(
-                        collection_name=self.collection_name,
-                        points=batch,
-                        wait=False  
-                    )
-                    progress.update(BATCH_SIZE)
+                for target, target_points in targets.items():
+                    self.prepareTarget(target)
+                    self.written_targets.add(target)
+                    for start in range(0, len(target_points), BATCH_SIZE):
+                        end = start + BATCH_SIZE
+                        batch = target_points[start:end]
+                        
+                        # Updates are applied in order, so waiting for the last batch acknowledges the whole target
+                        self.client.upsert(
+                            collection_name=target,
+                            points=batch,
+                            wait=end >= len(target_points)
+                        )
+                        progress.update(len(batch))
             
     def embedData(self):
-        createColl = self.createCollection()
-        if not createColl:
-            logger.error( "Collection could not be created")
-            sys.exit(1)
+        # Bring existing collections/partitions up to the current payload schema
+        for target in self.partitions.resolve(self.client):
+            if target == self.collection_name and not self.client.collection_exists(target):
+                continue
+            self.createIndex(target)
+            self.backfillDocType(target)
+            self.ready_targets.add(target)
 
         points_circ = self.createPoints()
         points_corpo = self.createPointsCorpo()
         if points_circ :
             logger.info("Qdrant points created for circulars")
-            self.createIndex()
             self.upsertPoints(points=points_circ)
             logger.info("Qdrant points embedded sucessfully for circulars")
         
         if points_corpo:
             logger.info("Qdrant points created for corporate actions data")
-            self.createIndex(circulars=False)
-            logger.info("Index created sucussfully ..")
             self.upsertPoints(points=points_corpo,desc="Embedding corporate actions data")
             logger.info("Qdrant points embedded sucessfully for corporate actions data")
 
-        else:
+        elif not points_circ:
             logger.warning("No Data found to upsert")
             sys.exit(1)
+
+        # New data invalidates cached answers in running RAG instances. Only bump once every
+        # write is acknowledged and indexed, or answers over half-applied upserts get cached as current
+        indexed = self.waitForIndexing()
+        self.docstore.bump_version()
+        logger.info(f"Qdrant client stats: {client_stats()}")
+
+        if self.warmup and indexed:
+            self.warmCaches()
+        elif self.warmup:
+            logger.warning("Skipping cache warm-up: collections are still indexing")
+    def waitForIndexing(self,timeout=None):
+        """Poll every collection/partition written this run until it is green; False if one isn't within `timeout` seconds."""
+        timeout = timeout if timeout is not None else float(os.getenv("INDEX_WAIT_TIMEOUT", 300))
+        deadline = time.monotonic() + timeout
+        for target in sorted(self.written_targets):
+            while self.client.get_collection(target).status != models.CollectionStatus.GREEN:
+                if time.monotonic() > deadline:
+                    logger.warning(f"{target} did not finish indexing in {timeout:.0f}s")
+                    return False
+                time.sleep(1)
+        return True
+    def warmCaches(self):
+        """Run the configured warm-up questions (src/warmup.py) against the fresh data."""
+        # Imported here so ingestion-only runs don't load the query/LLM stack
+        from src.rag import RAG
+        from src.warmup import warm_up
+        try:
+            rag = RAG(backend=self.backend)
+            return warm_up(rag)
+        except Exception as e:
+            # Data is already ingested; a failed warm-up only means colder first queries
+            logger.warning(f"Cache warm-up failed: {e}")
+            return None
 if __name__ == "__main__":
   
     emb_obj = EmbedContent(folder="./data")
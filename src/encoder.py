@@ -0,0 +1,142 @@
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+import numpy as np
+from qdrant_client import models
+
+logger = logging.getLogger(__name__)
+
+DENSE_MODEL = "BAAI/bge-small-en"
+SPARSE_MODEL = "Qdrant/bm25"
+
+
+def normalize(text):
+    """Cache key for a query: both models are case-insensitive, so lowercase and collapse whitespace."""
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+class QueryEncoder:
+    """
+    Encodes questions into (dense, sparse) query vectors once, with an LRU cache.
+
+    Passing these vectors to `query_points` replaces `models.Document`, which
+    made qdrant-client run both fastembed models for every prefetch/query of
+    every partition. Repeated or re-cased questions skip inference entirely.
+    """
+    def __init__(self, cache_size=1024):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        # One lock per model, apart from the cache lock, so the BM25 fallback never waits on a cold dense load
+        self.dense_lock = threading.Lock()
+        self.sparse_lock = threading.Lock()
+        self.dense_model = None
+        self.sparse_model = None
+        self.hits = 0
+        self.misses = 0
+        self.encode_times = deque(maxlen=1000)
+
+    def load(self, dense=True):
+        # fastembed is imported lazily so modules that only ingest don't pay for it
+        if self.sparse_model is None:
+            with self.sparse_lock:
+                if self.sparse_model is None:
+                    from fastembed import SparseTextEmbedding
+                    self.sparse_model = SparseTextEmbedding(SPARSE_MODEL)
+                    logger.info("Sparse query model loaded")
+        if dense and self.dense_model is None:
+            with self.dense_lock:
+                if self.dense_model is None:
+                    from fastembed import TextEmbedding
+                    self.dense_model = TextEmbedding(DENSE_MODEL)
+                    logger.info("Dense query model loaded")
+
+    def encode_batch(self, queries):
+        """Encode many questions with one model call per model for the ones not cached; same tuples as encode."""
+        keys = [normalize(q) for q in queries]
+        vectors = {}
+        with self.lock:
+            for key in keys:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    vectors[key] = self.cache[key]
+            self.hits += sum(1 for key in keys if key in vectors)
+            missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+            self.misses += len(missing)
+
+        if missing:
+            self.load()
+            start = time.perf_counter()
+            dense = list(self.dense_model.query_embed(missing))
+            sparse = list(self.sparse_model.query_embed(missing))
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                for key, d, sp in zip(missing, dense, sparse):
+                    vectors[key] = (
+                        d.tolist(),
+                        models.SparseVector(indices=sp.indices.tolist(), values=sp.values.tolist()),
+                    )
+                    self.cache[key] = vectors[key]
+                    if len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+                self.encode_times.append(elapsed / len(missing))
+            logger.info(f"Encoded {len(missing)} questions in one batch ({elapsed:.2f}s)")
+        return [vectors[key] for key in keys]
+
+    def encode_sparse(self, query):
+        """
+        BM25 query vector only (no dense model needed), for degraded searches.
+
+        Returns:
+            tuple: (None, models.SparseVector)
+        """
+        key = normalize(query)
+        with self.lock:
+            if key in self.cache:
+                return None, self.cache[key][1]
+        self.load(dense=False)
+        sparse = next(iter(self.sparse_model.query_embed(key)))
+        return None, models.SparseVector(indices=sparse.indices.tolist(), values=sparse.values.tolist())
+
+    def encode(self, query):
+        """
+        Returns:
+            tuple: (dense vector as list[float], models.SparseVector)
+        """
+        key = normalize(query)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            self.misses += 1
+
+        self.load()
+        start = time.perf_counter()
+        dense = next(iter(self.dense_model.query_embed(key)))
+        sparse = next(iter(self.sparse_model.query_embed(key)))
+        vectors = (
+            dense.tolist(),
+            models.SparseVector(indices=sparse.indices.tolist(), values=sparse.values.tolist()),
+        )
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.encode_times.append(elapsed)
+            self.cache[key] = vectors
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return vectors
+
+    def stats(self):
+        with self.lock:
+            times = list(self.encode_times)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "cached": len(self.cache),
+                "encode_p50_ms": round(float(np.percentile(times, 50)) * 1000, 2) if times else 0.0,
+                "encode_p99_ms": round(float(np.percentile(times, 99)) * 1000, 2) if times else 0.0,
+            }
@@ -0,0 +1,117 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+
+
+class Ticket:
+    def __init__(self, limiter, session):
+        self.limiter = limiter
+        self.session = session
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+    def position(self):
+        """1-based place in line (0 once a slot is granted)."""
+        return self.limiter.position(self)
+
+
+class FairLimiter:
+    """
+    Caps concurrent LLM streams, queuing the rest fairly across sessions.
+
+    Each session has its own FIFO queue and freed slots go round-robin
+    across sessions with waiting requests. A session sending a burst
+    therefore can't starve the others, and the provider sees at most
+    `max_concurrent` streams at a time (LLM_MAX_CONCURRENCY).
+    """
+    def __init__(self, max_concurrent=None, window=1000):
+        self.max_concurrent = max_concurrent or int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_CONCURRENCY))
+        self.lock = threading.Lock()
+        self.queues = OrderedDict()
+        self.active = 0
+        self.granted = 0
+        self.timeouts = 0
+        self.max_depth = 0
+        self.waits = deque(maxlen=window)
+
+    def depth(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def grant(self, ticket):
+        self.active += 1
+        self.granted += 1
+        self.waits.append(time.monotonic() - ticket.enqueued)
+        ticket.granted.set()
+
+    def enqueue(self, session="default"):
+        ticket = Ticket(self, session)
+        with self.lock:
+            if self.active < self.max_concurrent and not self.queues:
+                self.grant(ticket)
+            else:
+                self.queues.setdefault(session, deque()).append(ticket)
+                self.max_depth = max(self.max_depth, self.depth())
+        return ticket
+
+    def wait(self, ticket, timeout=None):
+        """Block until the ticket holds a slot; False (and out of the queue) on timeout."""
+        if ticket.granted.wait(timeout):
+            return True
+        with self.lock:
+            if ticket.granted.is_set():
+                return True
+            queue = self.queues.get(ticket.session)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self.queues[ticket.session]
+            self.timeouts += 1
+        return False
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+            while self.queues and self.active < self.max_concurrent:
+                session, queue = next(iter(self.queues.items()))
+                ticket = queue.popleft()
+                # Served sessions go to the back of the rotation
+                del self.queues[session]
+                if queue:
+                    self.queues[session] = queue
+                self.grant(ticket)
+
+    def position(self, ticket):
+        if ticket.granted.is_set():
+            return 0
+        with self.lock:
+            queues = [list(q) for q in self.queues.values()]
+        place = 0
+        for turn in range(max((len(q) for q in queues), default=0)):
+            for queue in queues:
+                if turn < len(queue):
+                    place += 1
+                    if queue[turn] is ticket:
+                        return place
+        return 0
+
+    def stats(self):
+        with self.lock:
+            waits = list(self.waits)
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self.active,
+                "queued": self.depth(),
+                "max_queued": self.max_depth,
+                "sessions_waiting": len(self.queues),
+                "granted": self.granted,
+                "timeouts": self.timeouts,
+                "wait_p50_ms": round(float(np.percentile(waits, 50)) * 1000, 2) if waits else 0.0,
+                "wait_p99_ms": round(float(np.percentile(waits, 99)) * 1000, 2) if waits else 0.0,
+            }
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import queue
+import socket
+import logging
+import threading
+from collections import deque
+import numpy as np
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+DEFAULT_TIMEOUT = 60
+FAILURES_BEFORE_COOLDOWN = 3
+COOLDOWN = 30
+# Score of an endpoint with no TTFT samples yet, while no endpoint has any
+PROBE_TTFT = 1.0
+
+
+class Endpoint:
+    """One OpenAI-compatible chat endpoint with rolling TTFT and error-rate stats."""
+    def __init__(self, name, base_url, api_key, model, timeout=DEFAULT_TIMEOUT, window=50):
+        self.name = name
+        self.base_url = base_url
+        self.model = model
+        # Failover is the router's job, so the client itself doesn't retry
+        self.client = OpenAI(base_url=base_url, api_key=api_key, timeout=timeout, max_retries=0)
+        self.lock = threading.Lock()
+        self.ttfts = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record_ttft(self, seconds):
+        with self.lock:
+            self.ttfts.append(seconds)
+
+    def record(self, ok):
+        with self.lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= FAILURES_BEFORE_COOLDOWN:
+                self.cooldown_until = time.monotonic() + COOLDOWN
+                logger.warning(f"LLM endpoint {self.name} failed {self.consecutive_failures} times, cooling down {COOLDOWN}s")
+
+    def healthy(self):
+        return time.monotonic() >= self.cooldown_until
+
+    def ttft(self):
+        with self.lock:
+            return float(np.percentile(list(self.ttfts), 50)) if self.ttfts else None
+
+    def error_rate(self):
+        with self.lock:
+            return 1 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def score(self, probe=PROBE_TTFT):
+        # Unmeasured endpoints are scored as `probe` (the best measured TTFT) so they get tried once;
+        # errors weigh like extra latency, so one failing before any token still drops back
+        ttft = self.ttft()
+        return (ttft if ttft is not None else probe) * (1 + 4 * self.error_rate())
+
+    def stats(self):
+        with self.lock:
+            ttfts = list(self.ttfts)
+            outcomes = list(self.outcomes)
+        return {
+            "model": self.model,
+            "healthy": self.healthy(),
+            "requests": len(outcomes),
+            "error_rate": round(1 - sum(outcomes) / len(outcomes), 4) if outcomes else 0.0,
+            "ttft_p50_ms": round(float(np.percentile(ttfts, 50)) * 1000, 2) if ttfts else None,
+            "ttft_p99_ms": round(float(np.percentile(ttfts, 99)) * 1000, 2) if ttfts else None,
+        }
+
+
+class Attempt:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.cancelled = threading.Event()
+        self.buffered = []
+        self.first_token = False
+        self.finished = False
+        self.stream = None
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def mark_first_token(self):
+        with self.lock:
+            if self.cancelled.is_set():
+                return
+            self.first_token = True
+        self.endpoint.record_ttft(time.perf_counter() - self.started)
+
+    def cancel(self, floor=0.0):
+        """
+        Stop the attempt and close its stream so a stalled provider doesn't hold the
+        connection until LLM_TIMEOUT. An attempt still waiting for its first token is
+        recorded as at least `floor` (the winner's TTFT) slow, so endpoints that keep
+        losing hedges are still measured and ranked.
+        """
+        with self.lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            if self.finished:
+                return
+            waiting = not self.first_token
+        if waiting:
+            self.endpoint.record_ttft(max(time.perf_counter() - self.started, floor))
+        if self.stream is not None:
+            try:
+                # Closing the response alone doesn't wake the thread blocked reading it; shutting the socket down does
+                network = self.stream.response.extensions.get("network_stream")
+                sock = network.get_extra_info("socket") if network is not None else None
+                if sock is not None:
+                    sock.shutdown(socket.SHUT_RDWR)
+                self.stream.close()
+            except Exception:
+                pass
+
+
+class LLMRouter:
+    """
+    Streams chat completions from the fastest healthy endpoint.
+
+    Endpoints are ranked by rolling p50 time-to-first-token, weighted by
+    error rate. An endpoint that fails repeatedly cools down for COOLDOWN
+    seconds. A request that fails before its first token fails over to the
+    next endpoint. With `hedge_after`, a second endpoint is also started
+    when the first has produced no token by then; whichever answers first
+    is streamed and the other is cancelled.
+    """
+    def __init__(self, endpoints, hedge_after=None):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one endpoint")
+        self.endpoints = endpoints
+        self.hedge_after = hedge_after
+        self.hedges = 0
+        self.failovers = 0
+
+    @classmethod
+    def from_env(cls, model):
+        """
+        Endpoints from the environment: OpenRouter (OPENAI_API_KEY) and Gemini
+        (GEMINI_API_KEY), plus any listed in LLM_ENDPOINTS as a JSON list of
+        {"name", "base_url", "api_key" or "api_key_env", "model"}, e.g. local
+        stub servers. LLM_HEDGE_AFTER (seconds) enables hedging.
+        """
+        timeout = float(os.getenv("LLM_TIMEOUT", DEFAULT_TIMEOUT))
+        endpoints = []
+        if os.getenv("OPENAI_API_KEY"):
+            endpoints.append(Endpoint("openrouter", OPENROUTER_URL, os.getenv("OPENAI_API_KEY"), model, timeout))
+        if os.getenv("GEMINI_API_KEY"):
+            endpoints.append(Endpoint("gemini", GEMINI_URL, os.getenv("GEMINI_API_KEY"), model, timeout))
+        for spec in json.loads(os.getenv("LLM_ENDPOINTS", "[]")):
+            api_key = spec.get("api_key") or os.getenv(spec.get("api_key_env", ""), "none")
+            endpoints.append(Endpoint(spec["name"], spec["base_url"], api_key, spec.get("model", model), timeout))
+        if not endpoints:
+            print("No API key detected.")
+            # Keep the previous behaviour of failing on the first request, not at startup
+            endpoints.append(Endpoint("gemini", GEMINI_URL, "missing", model, timeout))
+        hedge_after = os.getenv("LLM_HEDGE_AFTER")
+        return cls(endpoints, hedge_after=float(hedge_after) if hedge_after else None)
+
+    def rank(self):
+        healthy = [e for e in self.endpoints if e.healthy()]
+        if not healthy:
+            # Everything is cooling down; try the one that recovers first rather than failing outright
+            return sorted(self.endpoints, key=lambda e: e.cooldown_until)
+        measured = [t for t in (e.ttft() for e in healthy) if t is not None]
+        probe = min(measured) if measured else PROBE_TTFT
+        # On equal scores unmeasured endpoints go first
+        return sorted(healthy, key=lambda e: (e.score(probe), e.ttft() is not None))
+
+    def run(self, attempt, messages, kwargs, events):
+        endpoint = attempt.endpoint
+        try:
+            stream = endpoint.client.chat.completions.create(model=endpoint.model, messages=messages, stream=True, **kwargs)
+            attempt.stream = stream
+            try:
+                # Cancelled before the stream was set, so cancel() could not close it
+                for event in () if attempt.cancelled.is_set() else stream:
+                    if not attempt.first_token and event.choices and event.choices[0].delta.content:
+                        attempt.mark_first_token()
+                    if attempt.cancelled.is_set():
+                        break
+                    events.put((attempt, "event", event))
+            finally:
+                stream.close()
+                attempt.finished = True
+            if attempt.first_token or not attempt.cancelled.is_set():
+                endpoint.record(True)
+            events.put((attempt, "done", None))
+        except Exception as e:
+            attempt.finished = True
+            if attempt.cancelled.is_set():
+                events.put((attempt, "done", None))
+            else:
+                endpoint.record(False)
+                events.put((attempt, "error", e))
+
+    def stream(self, messages, first_token_timeout=None, **kwargs):
+        """
+        Yield chat.completion.chunk events from the winning endpoint.
+
+        Raises TimeoutError when no endpoint has produced a token within
+        `first_token_timeout` seconds.
+        """
+        pending = self.rank()
+        events = queue.Queue()
+        attempts = []
+        winner = None
+        error = None
+        started = time.monotonic()
+
+        def launch():
+            attempt = Attempt(pending.pop(0))
+            attempts.append(attempt)
+            threading.Thread(target=self.run, args=(attempt, messages, kwargs, events), name=f"llm-{attempt.endpoint.name}", daemon=True).start()
+            return attempt
+
+        launch()
+        live = 1
+        try:
+            while True:
+                timeout = None
+                hedging = winner is None and self.hedge_after is not None and pending and len(attempts) == 1
+                if hedging:
+                    timeout = max(0.0, started + self.hedge_after - time.monotonic())
+                if winner is None and first_token_timeout is not None:
+                    deadline = max(0.0, started + first_token_timeout - time.monotonic())
+                    if timeout is None or deadline < timeout:
+                        timeout, hedging = deadline, False
+                try:
+                    attempt, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    if not hedging:
+                        raise TimeoutError(f"No token from any LLM endpoint within {first_token_timeout:.2f}s")
+                    self.hedges += 1
+                    hedge = launch()
+                    live += 1
+                    logger.info(f"No token from {attempts[0].endpoint.name} after {self.hedge_after}s, hedging on {hedge.endpoint.name}")
+                    continue
+
+                if winner is not None and attempt is not winner:
+                    continue
+                if kind == "event":
+                    if winner is None:
+                        attempt.buffered.append(payload)
+                        if not attempt.first_token:
+                            continue
+                        winner = attempt
+                        winner_ttft = time.perf_counter() - winner.started
+                        for other in attempts:
+                            if other is not winner:
+                                other.cancel(floor=winner_ttft)
+                        yield from winner.buffered
+                        winner.buffered = []
+                    else:
+                        yield payload
+                    continue
+
+                if kind == "error":
+                    logger.warning(f"LLM endpoint {attempt.endpoint.name} failed: {payload}")
+                    if attempt is winner:
+                        raise payload
+                    error = payload
+                elif winner is None and not attempt.buffered:
+                    # Finished without any event; treat like a failure to answer
+                    error = error or RuntimeError(f"LLM endpoint {attempt.endpoint.name} returned an empty stream")
+                else:
+                    # Finished (empty answer or winner done)
+                    yield from attempt.buffered
+                    return
+
+                live -= 1
+                if live == 0:
+                    if not pending:
+                        raise error
+                    self.failovers += 1
+                    launch()
+                    live += 1
+        finally:
+            # Also closes the winner's stream when the caller stops reading early (stop phrase)
+            for attempt in attempts:
+                attempt.cancel()
+
+    def stats(self):
+        return {
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "endpoints": {e.name: e.stats() for e in self.endpoints},
+        }
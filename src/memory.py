@@ -0,0 +1,121 @@
+import os
+import re
+import logging
+from src.context import count_tokens, cut_line
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_BUDGET = 1200
+# Share of the history budget recent turns may use verbatim; the rest is left for the summary
+RECENT_SHARE = 0.7
+MAX_RECENT_MESSAGES = 4
+MAX_ANSWER_TOKENS = 300
+MAX_ENTITIES = 15
+
+SYMBOL = re.compile(r"\b[A-Z][A-Z0-9&]{2,19}\b")
+CIRCULAR_NO = re.compile(r"\b[A-Z]{2,}(?:/[A-Za-z0-9-]+){2,}\b")
+DATE = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}[-/.]\d{1,2}[-/.]\d{4}\b|"
+    r"\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}\b"
+)
+# Upper-case words that are not symbols
+COMMON_TERMS = {
+    "NSE", "BSE", "SEBI", "NSCCL", "NSEIL", "ISIN", "CML", "FAQ", "THE", "AND", "FOR", "NOT", "INR", "RBI",
+    "IPO", "OFS", "ETF", "REIT", "INVIT", "SME", "EQ", "BE", "CUSPA", "URL", "PDF", "NOTE", "LTD", "LIMITED",
+}
+
+
+def unique(values, limit=MAX_ENTITIES):
+    return list(dict.fromkeys(values))[:limit]
+
+
+class ConversationMemory:
+    """
+    Token-bounded chat history for LLM calls.
+
+    The last few messages are sent verbatim (long answers clipped to
+    MAX_ANSWER_TOKENS) within RECENT_SHARE of the budget. Older turns are
+    folded into one compact note that lists the earlier questions and the
+    symbols, circular numbers and dates mentioned. The history part of the
+    prompt therefore stays under `budget` however long the conversation gets.
+    """
+    def __init__(self, budget=None):
+        self.budget = budget or int(os.getenv("HISTORY_TOKEN_BUDGET", DEFAULT_HISTORY_BUDGET))
+
+    def clip(self, content, tokens=MAX_ANSWER_TOKENS):
+        if count_tokens(content) <= tokens:
+            return content
+        lines, used = [], 0
+        for line in content.splitlines():
+            cost = count_tokens(line + "\n")
+            if used + cost > tokens:
+                # Cut inside the line rather than drop it (answers are often one long paragraph)
+                cut = cut_line(line, tokens - used - 1)
+                if cut.strip():
+                    lines.append(cut)
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(lines) + "\n[...]"
+
+    def entities(self, messages):
+        text = "\n".join(m["content"] for m in messages)
+        circulars = CIRCULAR_NO.findall(text)
+        # Circular numbers are upper-case too; don't list their parts as symbols
+        remainder = CIRCULAR_NO.sub(" ", text)
+        symbols = [s for s in SYMBOL.findall(remainder) if s not in COMMON_TERMS and not s.isdigit()]
+        return {
+            "Symbols": unique(reversed(symbols)),
+            "Circulars": unique(reversed(circulars)),
+            "Dates": unique(reversed(DATE.findall(text))),
+        }
+
+    def summarize(self, messages, tokens):
+        """One note standing in for `messages`, newest questions first, within `tokens`."""
+        if not messages or tokens <= 0:
+            return None
+        lines = ["Summary of the earlier conversation:"]
+        for name, values in self.entities(messages).items():
+            if values:
+                lines.append(f"{name} discussed: {', '.join(values)}")
+        questions = [m["content"].strip().replace("\n", " ") for m in reversed(messages) if m["role"] == "user"]
+        if questions:
+            lines.append("Earlier questions (latest first):")
+        used = count_tokens("\n".join(lines))
+        for question in questions:
+            line = f"- {question[:200]}"
+            used += count_tokens(line + "\n")
+            if used > tokens:
+                break
+            lines.append(line)
+        note = "\n".join(lines)
+        return self.clip(note, tokens) if count_tokens(note) > tokens else note
+
+    def messages(self, chat_history, query=None):
+        """
+        Args:
+            chat_history (list): {"role", "content"} messages, oldest first.
+            query (str): Current question; dropped from the end of the history if the caller already appended it.
+
+        Returns:
+            list: History messages to send before the current question.
+        """
+        history = [m for m in chat_history if m.get("content")]
+        if query is not None and history and history[-1]["role"] == "user" and history[-1]["content"] == query:
+            history = history[:-1]
+
+        recent, used = [], 0
+        for message in reversed(history):
+            content = self.clip(message["content"]) if message["role"] == "assistant" else message["content"]
+            cost = count_tokens(content)
+            if len(recent) >= MAX_RECENT_MESSAGES or used + cost > self.budget * RECENT_SHARE:
+                break
+            recent.insert(0, {"role": message["role"], "content": content})
+            used += cost
+
+        summary = self.summarize(history[:len(history) - len(recent)], self.budget - used)
+        if summary:
+            recent.insert(0, {"role": "user", "content": summary})
+            used += count_tokens(summary)
+        logger.info(f"History: {len(history)} messages -> {len(recent)} ({used} tokens)")
+        return recent
@@ -0,0 +1,206 @@
+import argparse
+import logging
+import os
+import time
+from datetime import datetime as dt, timedelta
+from qdrant_client import models
+from src.profiles import DENSE_VECTOR
+from src.vectorstore import BACKENDS, get_client
+
+logger = logging.getLogger(__name__)
+
+BASE_COLLECTION = "nsechatbot-rag-sparse_dense"
+PERIODS = ("month", "quarter", "none")
+
+
+def to_date(value):
+    if value is None or isinstance(value, dt):
+        return value
+    return dt.fromisoformat(str(value)[:19])
+
+
+class PartitionScheme:
+    """
+    Time-partitioned collections behind aliases.
+
+    Each month/quarter is stored in its own physical collection
+    (`<base>_<key>`) and addressed through an alias (`<base>-<key>`), so a
+    partition can be rebuilt behind its alias without touching readers. With
+    period="none" everything goes to the single `<base>` collection as before.
+    A pre-partitioning `<base>` collection, if present, is always searched too.
+
+    With `cache_ttl`, `resolve` reuses the alias map for that many seconds, or
+    until the collection version it is given changes, instead of asking Qdrant
+    on every question.
+    """
+    def __init__(self, base=BASE_COLLECTION, period=None, cache_ttl=0):
+        self.base = base
+        self.period = period or os.getenv("QDRANT_PARTITION", "month")
+        if self.period not in PERIODS:
+            raise ValueError(f"Unknown partition period '{self.period}'. Choose from {PERIODS}")
+        self.cache_ttl = cache_ttl
+        # (fetched at, collection version, live partitions, base collection exists)
+        self.layout = None
+
+    @property
+    def enabled(self):
+        return self.period != "none"
+
+    def key(self, date):
+        date = to_date(date)
+        if self.period == "quarter":
+            return f"{date.year}-Q{(date.month - 1) // 3 + 1}"
+        return f"{date.year}-{date.month:02d}"
+
+    def start_of(self, key):
+        if self.period == "quarter":
+            year, quarter = key.split("-Q")
+            return dt(int(year), (int(quarter) - 1) * 3 + 1, 1)
+        return dt.strptime(key, "%Y-%m")
+
+    def end_of(self, key):
+        start = self.start_of(key)
+        months = 3 if self.period == "quarter" else 1
+        month = start.month - 1 + months
+        return dt(start.year + month // 12, month % 12 + 1, 1) - timedelta(microseconds=1)
+
+    def keys_between(self, start, end):
+        start, end = to_date(start), to_date(end)
+        keys = []
+        current = self.start_of(self.key(start))
+        while current <= end:
+            keys.append(self.key(current))
+            current = self.end_of(self.key(current)) + timedelta(microseconds=1)
+        return keys
+
+    def alias(self, key):
+        return f"{self.base}-{key}"
+
+    def collection(self, key):
+        return f"{self.base}_{key}"
+
+    def target_for(self, payload):
+        """Alias a payload should be written to, based on its circular or ex-date."""
+        date = payload.get("cirDisplayDate") or payload.get("exDate")
+        if not self.enabled or not date:
+            return self.base
+        return self.alias(self.key(date))
+
+    def live_partitions(self, client):
+        """Map of partition key -> alias for every partition alias in Qdrant."""
+        return self.partitions_from(client.get_aliases().aliases)
+
+    def partitions_from(self, aliases):
+        prefix = f"{self.base}-"
+        partitions = {}
+        for alias in aliases:
+            if alias.alias_name.startswith(prefix) and alias.collection_name.startswith(f"{self.base}_"):
+                partitions[alias.alias_name[len(prefix):]] = alias.alias_name
+        return partitions
+
+    def ensure(self, client, target, create_collection):
+        """
+        Make sure `target` exists. For a partition alias this creates the physical
+        collection through `create_collection(name)` and points the alias at it.
+        """
+        if target == self.base:
+            create_collection(self.base)
+            return target
+        key = target[len(self.base) + 1:]
+        if key in self.live_partitions(client):
+            return target
+        physical = self.collection(key)
+        create_collection(physical)
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                models.CreateAliasOperation(
+                    create_alias=models.CreateAlias(collection_name=physical, alias_name=target)
+                )
+            ]
+        )
+        self.layout = None
+        logger.info(f"Created partition {physical} behind alias {target}")
+        return target
+
+    def cached_layout(self, version=None, stale=False):
+        """(live partitions, base exists) from the last lookup if still fresh for `version`; any age with `stale`."""
+        layout = self.layout
+        if layout is None:
+            return None
+        fetched, cached_version, live, base_exists = layout
+        if stale or (time.monotonic() - fetched < self.cache_ttl and cached_version == version):
+            return live, base_exists
+        return None
+
+    def resolve(self, client, start=None, end=None, version=None):
+        """Collections/aliases to search for a date range (all of them when no range)."""
+        if not self.enabled:
+            return [self.base]
+        layout = self.cached_layout(version)
+        if layout is None:
+            layout = self.live_partitions(client), client.collection_exists(self.base)
+            self.layout = (time.monotonic(), version, *layout)
+        return self.select(*layout, start, end)
+
+    def resolve_cached(self, start=None, end=None):
+        """`resolve` from the last alias map fetched, however old; None if there is none."""
+        if not self.enabled:
+            return [self.base]
+        layout = self.cached_layout(stale=True)
+        return self.select(*layout, start, end) if layout else None
+
+    def select(self, live, base_exists, start=None, end=None):
+        targets = [self.base] if base_exists else []
+        if start and end:
+            wanted = self.keys_between(start, end)
+            targets.extend(live[key] for key in wanted if key in live)
+        else:
+            targets.extend(live[key] for key in sorted(live))
+        return targets
+
+    def apply_retention(self, client, on_disk_after=None, drop_after=None):
+        """
+        Move partitions older than `on_disk_after` days to disk and drop those
+        older than `drop_after` days. Age is measured from the end of the period.
+
+        Returns:
+            dict: Partition keys grouped by the action taken.
+        """
+        today = dt.today()
+        actions = {"on_disk": [], "dropped": []}
+        for key, alias in sorted(self.live_partitions(client).items()):
+            age = (today - self.end_of(key)).days
+            if drop_after is not None and age > drop_after:
+                client.update_collection_aliases(
+                    change_aliases_operations=[
+                        models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias))
+                    ]
+                )
+                client.delete_collection(self.collection(key))
+                actions["dropped"].append(key)
+            elif on_disk_after is not None and age > on_disk_after:
+                client.update_collection(
+                    collection_name=self.collection(key),
+                    vectors_config={DENSE_VECTOR: models.VectorParamsDiff(on_disk=True)},
+                    hnsw_config=models.HnswConfigDiff(on_disk=True),
+                )
+                actions["on_disk"].append(key)
+        logger.info(f"Retention applied: {actions}")
+        return actions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List partitions or apply the retention policy")
+    parser.add_argument("--period", choices=PERIODS, default=None)
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    parser.add_argument("--on_disk_after", type=int, default=None, help="Move partitions older than N days to disk")
+    parser.add_argument("--drop_after", type=int, default=None, help="Drop partitions older than N days")
+    args = parser.parse_args()
+
+    client = get_client(args.backend)
+    scheme = PartitionScheme(period=args.period)
+    if args.on_disk_after is None and args.drop_after is None:
+        for key, alias in sorted(scheme.live_partitions(client).items()):
+            print(f"{key}: {alias} -> {scheme.collection(key)}")
+    else:
+        print(scheme.apply_retention(client, on_disk_after=args.on_disk_after, drop_after=args.drop_after))
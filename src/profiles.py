@@ -0,0 +1,179 @@
+from qdrant_client import models
+
+DENSE_VECTOR = "bge-small-en"
+DENSE_SIZE = 384
+SPARSE_VECTOR = "bm25"
+
+# Storage profiles for the dense vectors. "float32" is the original layout
+# (full precision, everything in RAM, default HNSW) and is used as the recall
+# baseline by src/benchmark.py.
+COLLECTION_PROFILES = {
+    "float32": {},
+    "float16": {
+        "datatype": "float16",
+    },
+    "int8": {
+        "quantization": "int8",
+        "rescore": True,
+        "oversampling": 2.0,
+    },
+    "int8-disk": {
+        "quantization": "int8",
+        "rescore": True,
+        "oversampling": 2.0,
+        "on_disk": True,
+        "on_disk_payload": True,
+    },
+    "binary": {
+        "quantization": "binary",
+        "rescore": True,
+        "oversampling": 3.0,
+    },
+    "binary-disk": {
+        "quantization": "binary",
+        "rescore": True,
+        "oversampling": 3.0,
+        "on_disk": True,
+        "on_disk_payload": True,
+        "hnsw_payload_m": 16,
+        "hnsw_ef_construct": 100,
+    },
+}
+
+DEFAULT_PROFILE = "float32"
+
+# Circular pages and corporate-action records share a collection but are
+# separate tenants, keyed by DOC_TYPE_FIELD.
+DOC_TYPE_FIELD = "doc_type"
+CIRCULAR = "circular"
+CORPORATE_ACTION = "corporate_action"
+DOC_TYPES = (CIRCULAR, CORPORATE_ACTION)
+# Date field each tenant is filtered on
+DATE_FIELDS = {CIRCULAR: "cirDisplayDate", CORPORATE_ACTION: "exDate"}
+
+# Circular fields kept on each page point (everything else is hydrated from
+# the local DocStore at prompt time)
+PAGE_PAYLOAD_FIELDS = ("id", "cirDisplayDate", "circDepartment", "circCategory")
+
+# Declarative payload indexes. EmbedContent.createIndex diffs this against the
+# live collection, so adding/changing an entry here is the whole migration.
+PAYLOAD_SCHEMA = {
+    DOC_TYPE_FIELD: models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    "id": models.PayloadSchemaType.KEYWORD,
+    "page_number": models.PayloadSchemaType.INTEGER,
+    "page_key": models.PayloadSchemaType.KEYWORD,
+    "document_name": models.PayloadSchemaType.KEYWORD,
+    "circDepartment": models.PayloadSchemaType.KEYWORD,
+    "circCategory": models.PayloadSchemaType.KEYWORD,
+    "cirDisplayDate": models.PayloadSchemaType.DATETIME,
+    "symbol": models.PayloadSchemaType.KEYWORD,
+    "series": models.PayloadSchemaType.KEYWORD,
+    "exDate": models.PayloadSchemaType.DATETIME,
+}
+
+
+def schema_type(schema):
+    """Normalise a schema entry (enum, string or *IndexParams) to its type name."""
+    if hasattr(schema, "type"):
+        schema = schema.type
+    return getattr(schema, "value", schema)
+
+
+def schema_matches(live, schema):
+    """Whether a live PayloadIndexInfo already satisfies a PAYLOAD_SCHEMA entry."""
+    if schema_type(live.data_type) != schema_type(schema):
+        return False
+    wanted_tenant = bool(getattr(schema, "is_tenant", False))
+    return bool(getattr(live.params, "is_tenant", False)) == wanted_tenant
+
+
+def get_profile(name):
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}'. Choose from {list(COLLECTION_PROFILES)}")
+    return COLLECTION_PROFILES[name]
+
+
+def quantization_config(profile):
+    kind = profile.get("quantization")
+    if kind == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True,
+            )
+        )
+    if kind == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
+
+
+def collection_params(name=DEFAULT_PROFILE):
+    """
+    Keyword arguments for `QdrantClient.create_collection` for a storage profile.
+
+    Args:
+        name (str): Key of COLLECTION_PROFILES.
+
+    Returns:
+        dict: vectors_config, sparse_vectors_config and the optional
+        quantization / hnsw / on-disk payload settings.
+    """
+    profile = get_profile(name)
+    dense = models.VectorParams(
+        size=DENSE_SIZE,
+        distance=models.Distance.COSINE,
+        on_disk=profile.get("on_disk"),
+        datatype=models.Datatype.FLOAT16 if profile.get("datatype") == "float16" else None,
+    )
+    params = {
+        "vectors_config": {DENSE_VECTOR: dense},
+        "sparse_vectors_config": {
+            SPARSE_VECTOR: models.SparseVectorParams(modifier=models.Modifier.IDF)
+        },
+    }
+    quantization = quantization_config(profile)
+    if quantization is not None:
+        params["quantization_config"] = quantization
+    if profile.get("on_disk_payload"):
+        params["on_disk_payload"] = True
+    # Multitenancy layout: every search filters on DOC_TYPE_FIELD, so there is no
+    # global graph (m=0) and each doc_type tenant gets its own HNSW graph (payload_m)
+    params["hnsw_config"] = models.HnswConfigDiff(
+        m=profile.get("hnsw_m", 0),
+        ef_construct=profile.get("hnsw_ef_construct"),
+        payload_m=profile.get("hnsw_payload_m", 16),
+    )
+    return params
+
+
+def search_params(name=DEFAULT_PROFILE):
+    """Query-time parameters for the dense prefetch (quantization rescoring)."""
+    profile = get_profile(name)
+    if not profile.get("quantization"):
+        return None
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            rescore=profile.get("rescore", True),
+            oversampling=profile.get("oversampling"),
+        )
+    )
+
+
+def live_search_params(quantization):
+    """
+    `search_params` for a collection from its live quantization config, so queries
+    rescore whatever profile the collection was created with.
+
+    Args:
+        quantization: `get_collection(...).config.quantization_config`.
+    """
+    if quantization is None:
+        return None
+    kind = "binary" if isinstance(quantization, models.BinaryQuantization) else "int8"
+    profile = next(p for p in COLLECTION_PROFILES.values() if p.get("quantization") == kind)
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=profile.get("oversampling"))
+    )
@@ -13,14 +13,91 @@ import os
 import docker
 from docker.errors import NotFound, APIError
 import time
+import shutil
+import sqlite3
+from datetime import datetime as dt
+from src.docstore import docstore_path
+
+logger = logging.getLogger(__name__)
+
+
+def poll(check, timeout=60, initial_delay=0.2, max_delay=2.0, backoff=1.5):
+    """Call `check` until it returns truthy or `timeout` seconds pass, backing off between tries."""
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        try:
+            if check():
+                return True
+        except Exception:
+            pass
+        if time.monotonic() + delay > deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * backoff, max_delay)
+
 
 class QdrantManager:
-    def __init__(self, container_name='qdrant', rest_port=6333, grpc_port=6334):
+    def __init__(self, container_name='qdrant', rest_port=6333, grpc_port=6334, host='localhost'):
         self.container_name = container_name
         self.rest_port = rest_port
         self.grpc_port = grpc_port
+        self.host = host
         self.client = None
-    def start_docker_service(self):
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.rest_port}"
+
+    def docker_ready(self):
+        try:
+            self.client = docker.from_env()
+            return self.client.ping()
+        except Exception:
+            return False
+
+    def is_ready(self):
+        """Qdrant's /readyz returns 200 once the server accepts requests."""
+        try:
+            return requests.get(f"{self.url}/readyz", timeout=2).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def wait_until_ready(self, timeout=60):
+        start = time.monotonic()
+        if not poll(self.is_ready, timeout=timeout):
+            print(f"Qdrant not ready after {timeout}s")
+            logger.error(f"Qdrant at {self.url} not ready after {timeout}s")
+            return False
+        logger.info(f"Qdrant ready in {time.monotonic() - start:.2f}s")
+        return True
+
+    def warm_up(self, timeout=120):
+        """
+        Wait until every collection is loaded and its optimizers are idle (status green),
+        so the first upsert/search doesn't race segment loading or indexing.
+        """
+        from qdrant_client import models
+        from src.vectorstore import get_client
+        qclient = get_client("server", url=self.url)
+
+        def collections_green():
+            for collection in qclient.get_collections().collections:
+                info = qclient.get_collection(collection.name)
+                if info.status != models.CollectionStatus.GREEN:
+                    return False
+            return True
+
+        if not poll(collections_green, timeout=timeout, max_delay=5.0):
+            logger.warning(f"Collections not green after {timeout}s, continuing anyway")
+            return False
+        logger.info("Qdrant collections loaded and ready")
+        return True
+
+    def start_docker_service(self, timeout=60):
+            if self.docker_ready():
+                return True
+
             system = platform.system()
             
             if system == "Linux":
@@ -42,12 +119,14 @@ class QdrantManager:
                 # Start Docker Desktop on Windows
                 subprocess.Popen(['C:\\Program Files\\Docker\\Docker\\Docker Desktop.exe'])
                 print("Docker Desktop starting...")
-                time.sleep(10)
                
 
-            self.client = docker.from_env()
+            if not poll(self.docker_ready, timeout=timeout):
+                print(f"Docker daemon not reachable after {timeout}s")
+                return False
+            return True
     def start(self):
-        """Start Qdrant container"""
+        """Start Qdrant container; returns it once ready, None if it never became ready"""
         try:
             # Check if already exists
             try:
@@ -55,13 +134,12 @@ class QdrantManager:
                 if container.status == 'running':
                     print("Qdrant is already running")
                     print(f"  Dashboard: http://localhost:{self.rest_port}/dashboard")
-                    return container
+                    return container if self.wait_until_ready() else None
                 else:
                     print("Starting existing container...")
                     print(f"  Dashboard: http://localhost:{self.rest_port}/dashboard")
                     container.start()
-                    time.sleep(7)
-                    return container
+                    return container if self.wait_until_ready() else None
             except NotFound:
                 pass
             
@@ -88,9 +166,7 @@ class QdrantManager:
             
             print(f"Qdrant started")
             print(f"  Dashboard: http://localhost:{self.rest_port}/dashboard")
-            time.sleep(5)
-            
-            return container
+            return container if self.wait_until_ready() else None
             
         except Exception as e:
             print(f"Error starting Qdrant: {e}")
@@ -129,7 +205,6 @@ class QdrantManager:
         """Restart Qdrant container"""
         print("Restarting Qdrant...")
         self.stop(timeout=timeout)
-        time.sleep(2)
         return self.start()
     
  
@@ -167,10 +242,119 @@ class QdrantManager:
                 print("Volume not found")
 
 
+    def list_collections(self, qclient):
+        """Physical collections to snapshot, with the alias (if any) that points to each."""
+        aliases = {a.collection_name: a.alias_name for a in qclient.get_aliases().aliases}
+        return [(c.name, aliases.get(c.name)) for c in qclient.get_collections().collections]
+
+    def snapshot(self, snapshot_dir="snapshots", track_file="logs/tracking/track_log.json", docstore=None):
+        """
+        Snapshot every collection into `<snapshot_dir>/<timestamp>/` along with the local
+        docstore and a manifest holding the ingestion tracking state.
+
+        Returns:
+            Path: Folder containing the snapshot files and manifest.json.
+        """
+        from src.vectorstore import get_client
+        qclient = get_client("server", url=self.url)
+        target = Path(snapshot_dir) / dt.now().strftime("%Y%m%d_%H%M%S")
+        target.mkdir(parents=True, exist_ok=True)
+
+        manifest = {"created_at": dt.now().isoformat(), "collections": [], "tracking": None, "docstore": None}
+        for collection_name, alias in self.list_collections(qclient):
+            description = qclient.create_snapshot(collection_name=collection_name, wait=True)
+            file_name = f"{collection_name}.snapshot"
+            url = f"{self.url}/collections/{collection_name}/snapshots/{description.name}"
+            with requests.get(url, stream=True, timeout=600) as response:
+                response.raise_for_status()
+                with open(target / file_name, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+            qclient.delete_snapshot(collection_name=collection_name, snapshot_name=description.name)
+            manifest["collections"].append({
+                "collection": collection_name,
+                "alias": alias,
+                "file": file_name,
+                "points_count": qclient.count(collection_name, exact=True).count,
+            })
+            print(f"Snapshot saved for {collection_name}")
+
+        if os.path.exists(track_file):
+            with open(track_file) as f:
+                manifest["tracking"] = json.load(f)
+
+        docstore = docstore or docstore_path()
+        if os.path.exists(docstore):
+            # sqlite backup API gives a consistent copy even while the store is open
+            with sqlite3.connect(docstore) as src, sqlite3.connect(target / "docstore.sqlite") as dst:
+                src.backup(dst)
+            manifest["docstore"] = "docstore.sqlite"
+
+        with open(target / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"Snapshot with {len(manifest['collections'])} collections saved to {target}")
+        return target
+
+    def latest_snapshot(self, snapshot_dir="snapshots"):
+        folders = sorted(p for p in Path(snapshot_dir).iterdir() if (p / "manifest.json").exists())
+        return folders[-1] if folders else None
+
+    def restore(self, snapshot_dir="snapshots", track_file="logs/tracking/track_log.json", docstore=None):
+        """
+        Restore collections, aliases, docstore and tracking state from a snapshot folder
+        (or the latest one under `snapshot_dir`). A following `main.py` run then only
+        fetches circulars newer than the snapshot.
+        """
+        from qdrant_client import models
+        from src.vectorstore import get_client
+        source = Path(snapshot_dir)
+        if not (source / "manifest.json").exists():
+            source = self.latest_snapshot(snapshot_dir)
+        if source is None:
+            print(f"No snapshot found in {snapshot_dir}")
+            return False
+        with open(source / "manifest.json") as f:
+            manifest = json.load(f)
+
+        qclient = get_client("server", url=self.url)
+        for entry in manifest["collections"]:
+            with open(source / entry["file"], "rb") as f:
+                response = requests.post(
+                    f"{self.url}/collections/{entry['collection']}/snapshots/upload",
+                    params={"priority": "snapshot", "wait": "true"},
+                    files={"snapshot": (entry["file"], f)},
+                    timeout=1800,
+                )
+            response.raise_for_status()
+            if entry.get("alias"):
+                qclient.update_collection_aliases(
+                    change_aliases_operations=[
+                        models.CreateAliasOperation(
+                            create_alias=models.CreateAlias(collection_name=entry["collection"], alias_name=entry["alias"])
+                        )
+                    ]
+                )
+            print(f"Restored {entry['collection']} ({entry['points_count']} points)")
+
+        if manifest.get("docstore"):
+            docstore = docstore or docstore_path()
+            os.makedirs(os.path.dirname(os.path.abspath(docstore)), exist_ok=True)
+            shutil.copyfile(source / manifest["docstore"], docstore)
+
+        if manifest.get("tracking"):
+            os.makedirs(os.path.dirname(track_file), exist_ok=True)
+            with open(track_file, "w") as f:
+                json.dump(manifest["tracking"], f, indent=2)
+
+        logger.info(f"Restored snapshot from {source} created at {manifest['created_at']}")
+        return True
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('--option',choices=['start', 'stop','status','remove'],default='start')
+    parser.add_argument('--option',choices=['start', 'stop','status','remove','snapshot','restore'],default='start')
     parser.add_argument("--remove_volume",choices=["yes","no"],default='no')
+    parser.add_argument("--snapshot_dir",default='snapshots',help="Folder to write snapshots to / restore the latest snapshot from")
     args = parser.parse_args()
 
     manager = QdrantManager()
@@ -185,5 +369,11 @@ if __name__ == '__main__':
     elif args.option == 'stop' :
         # Stop properly
         manager.stop()
+    elif args.option == 'snapshot':
+        manager.snapshot(snapshot_dir=args.snapshot_dir)
+    elif args.option == 'restore':
+        manager.start_docker_service()
+        manager.start()
+        manager.restore(snapshot_dir=args.snapshot_dir)
     else:
-        manager.remove(remove_volume=args.remove_volumne)
+        manager.remove(remove_volume=args.remove_volume == 'yes')
@@ -1,27 +1,165 @@
-from openai import OpenAI
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+from qdrant_client.models import Filter, FieldCondition, MatchAny
 import time
 from collections import defaultdict
+from itertools import chain
 import os
 import json
+import hashlib
 from src.processCirculars import CircularsFetchProcess
 from qdrant_client import QdrantClient, models
-import streamlit as st
 from typing import Dict,List
 from dotenv import load_dotenv
 import re
-from datetime import datetime as dt,timedelta
-from dateparser.search import search_dates
-from pandas.tseries.offsets import BDay
+from src.dateintent import DateIntentParser, check_bday
+from src.profiles import DOC_TYPE_FIELD, DOC_TYPES, DATE_FIELDS, CIRCULAR, CORPORATE_ACTION, live_search_params
+from src.partitions import PartitionScheme
+from src.docstore import DocStore
+from src.vectorstore import get_client
+from src.encoder import QueryEncoder, normalize
+from src.cache import TTLCache
+from src.context import ContextPacker, TokenUsage, count_tokens
+from src.memory import ConversationMemory
+from src.llm import LLMRouter
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as StageTimeout
+from src.deadline import Deadline
+from src.singleflight import SingleFlight
+from src.limiter import FairLimiter
 
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+CORPORATE_ACTION_TERMS = ('corporate action','dividend','bonus','split','buy back','buyback','rights',
+                          'ex-date','ex date','record date','face value','demerger','distribution')
+PAGES_PER_CIRCULAR = 5
+# Reciprocal rank fusion constant for merging hits across partitions
+RRF_K = 60
+STOP_PHRASE = "The provided circulars do not contain this information."
+# First-stage payload for circular hits: enough to expand them into pages, or to stand alone when expansion is skipped
+CIRCULAR_HIT_FIELDS = ["id", DOC_TYPE_FIELD, "cirDisplayDate", "page_key", "document_name", "page_number"]
+CIRCULAR_TERMS = ('circular','regulation','sebi','guideline','compliance','settlement','department',
+                  'holiday','mutual fund','surveillance','margin','f&o','derivative')
+
+SYSTEM_PROMPT = """You are an expert assistant specializing in NSE (National Stock Exchange of India) circulars.
+
+### INSTRUCTIONS
+- Answer using ONLY the information from the circular excerpts provided below.
+- Provide answers in a direct, natural conversational style as if the information is your own knowledge.
+- Do NOT mention document names, circular numbers, excerpts, or references in your response body.
+- Do NOT use phrases like "based on the provided circulars", "according to the documents", "CIRCULAR X states", or similar meta-references.
+- If multiple excerpts are from the same source, combine them coherently without citing the source.
+- Present information clearly and directly without repeatedly citing document structure.
+- When data is comparative or structured, use markdown tables for better readability.
+- Extract and present only relevant information. Reproduce full tables only when necessary for clarity.
+- Use the most recent information when there are conflicting details across different circulars.
+- Maintain a factual, neutral tone and speak authoritatively about the information.
+- Always identify and clearly present any corporate actions such as record dates, ex-dates, payment dates, rights issues, dividends, stock splits, etc., when mentioned in the circulars, regardless of whether the question explicitly asks about them.
+- When multiple important dates related to corporate actions (e.g., record date, ex-date, payment date) are present, list all clearly and distinctly.
+- Given a date in ISO 8601 format (e.g., 2025-12-05T00:00:00), convert it to a readable format: "Month Day, Year" (like December 5, 2025). 
+    For example:
+    Input: 2025-11-05T00:00:00
+    Output: November 5, 2025
+
+### CLASSIFICATION GUIDELINES
+- Non-Business Days refer ONLY to calendar dates or days when markets/operations are closed
+- Securities, funds, and financial instruments are NEVER categories of days
+- When answering questions about business days, focus exclusively on temporal information
+- Distinguish between: (1) What is being discussed (e.g., mutual funds), and (2) When it applies (e.g., business days)
+
+### STRICT RULES
+1. Do NOT use external knowledge or make assumptions beyond what's provided.
+2. Do NOT modify stock symbols, index names, or any codes - use them exactly as written.
+3. Do NOT invent data or speculate.
+4. If URLs are mentioned in the content, output them as plain text (no markdown/HTML formatting).
+5. Avoid repeating the same information multiple times.
+6. NEVER reference the document structure, excerpt numbers, or circular labels in your answer.
+7. Write as if you naturally know this information - do not mention your sources or say "the circular states" or "according to the document".
+8. If NO relevant information is found in the provided context after thorough review, respond with EXACTLY: "The provided circulars do not contain this information."
+9. Otherwise, provide a direct answer without any meta-commentary about where the information came from.
+
+### REASONING PROCESS
+Before answering:
+1. Identify which excerpts relate to the question
+2. Extract key facts from those excerpts
+3. Synthesize the information into a clear answer
+4. Verify your answer is supported by the provided context
+
+### VALIDATION CHECKLIST
+Before finalizing your answer, verify:
+- Have I confused an entity type (fund, security, index) with a time classification?
+- Does my answer logically match the question category?
+- If the question asks about dates/schedules, is my answer exclusively about temporal information?
+- If answering about mutual funds, am I describing fund categories/characteristics (correct) or treating them as time periods (incorrect)?"""
+# Only this message changes per question; the system prompt stays a byte-identical cacheable prefix
+QUESTION_TEMPLATE = """### CONTEXT
+{context}
+
+### QUESTION
+{query}
+
+### ANSWER"""
+
+class StopPhraseWatcher:
+    """Detects the stop phrase across chunk boundaries by scanning only the new chunk plus a short tail."""
+    def __init__(self,phrase=STOP_PHRASE):
+        self.phrase = phrase
+        self.tail = ""
+
+    def feed(self,chunk):
+        window = self.tail + chunk
+        self.tail = window[-(len(self.phrase) - 1):]
+        return self.phrase in window
+
+
+def coalesce_chunks(chunks,interval=0.05,max_chars=400):
+    """Merge streamed chunks into updates at most every `interval` seconds (or `max_chars`), so renderers redraw less often."""
+    buffer = []
+    size = 0
+    last = time.monotonic()
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        now = time.monotonic()
+        if now - last >= interval or size >= max_chars:
+            yield "".join(buffer)
+            buffer, size, last = [], 0, now
+    if buffer:
+        yield "".join(buffer)
+
 
 class RAG:
-    def __init__(self,model="gemini-2.5-flash-lite"):
-        self.client,self.chat_client = self.initClient()
+    def __init__(self,model="gemini-2.5-flash-lite",backend=None,report_usage=None):
+        self.backend = backend
+        self.client = get_client(self.backend)
         self.model=model
         self.provider=None
-        self.max_history = 4  # Keep last 4 exchanges (4 messages: 2 user + 2 assistant)
+        # Streams from the fastest healthy provider, with failover and optional hedging
+        self.router = LLMRouter.from_env(self.model)
+        # History is bounded by tokens; older turns are folded into a compact summary
+        self.memory = ConversationMemory()
+        # Rescoring settings per collection, read from its live quantization config (see search_params_for)
+        self.search_params = {}
+        # The alias map is cached briefly (and refreshed on ingestion) instead of looked up per question
+        self.partitions = PartitionScheme(cache_ttl=float(os.getenv("PARTITION_CACHE_TTL", 60)))
+        self.docstore = DocStore()
+        self.encoder = QueryEncoder()
+        self.date_parser = DateIntentParser()
+        self.packer = ContextPacker()
+        # Ask the provider for token usage (incl. prefix-cached prompt tokens) on the last stream chunk
+        if report_usage is None:
+            report_usage = os.getenv("REPORT_CACHED_TOKENS", "false").lower() in ("1", "true", "yes")
+        self.report_usage = report_usage
+        self.usage = TokenUsage()
+        self.answer_cache = TTLCache(ttl=int(os.getenv("ANSWER_CACHE_TTL", 600)),max_entries=512)
+        # Answers persisted in the docstore (e.g. by the post-ingestion warm-up) are reused by every process
+        self.answer_store_ttl = int(os.getenv("ANSWER_STORE_TTL", 86400))
+        # Identical questions (with the same history view) in flight at once share one retrieval and one LLM stream
+        self.flights = SingleFlight()
+        # At most LLM_MAX_CONCURRENCY streams at once, queued fairly across sessions
+        self.limiter = FairLimiter()
+        self.pool = ThreadPoolExecutor(max_workers=4)
+        # Stages run here so they can be abandoned at their deadline; kept apart from self.pool, which they use
+        self.stage_pool = ThreadPoolExecutor(max_workers=8)
 
     def getKey(self):
         openai_key = os.getenv("OPENAI_API_KEY")
@@ -41,63 +179,29 @@ class RAG:
             api_key = None
 
         return provider, api_key
-    def initClient(self):
-        client = QdrantClient("http://localhost:6333")
-        self.provider, api_key = self.getKey()
-        if self.provider == "openai":
-            try:
-                chat_client = OpenAI(
-                    base_url="https://openrouter.ai/api/v1",
-                    api_key=api_key,
-                        )
-                return client,chat_client
-            except:
-                return False
-        else:
-            chat_client = OpenAI(
-            api_key=api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-    )
-            return client,chat_client
     def check_bday(self,date):
         """Check if the date is business day or not . If not then add 1 day"""
-        bday = BDay()
-        check_bday = bday.is_on_offset(date)
-        if not check_bday:
-            date += BDay(1)
-            
-        return date
-    def fetchDateRange(self,query):
-        match = re.search(r'next\s+(?:(\d+)\s+days?|week|month)', query.lower())
-        if any(term in query.lower() for term in ['latest', 'recent', 'new']):
-            end_date = dt.today().replace(hour=0, minute=0, second=0, microsecond=0)
-            start_date = end_date - timedelta(days=15)
-            start_date = start_date.isoformat()
-            end_date = end_date.isoformat()
-            return start_date,end_date
-        elif match:
-            start_date = dt.today().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-        
-            if match.group(1):  # "next X days"
-                n_days = int(match.group(1))
-                end_date = start_date + timedelta(days=n_days)
-            
-            elif 'week' in match.group(0):  # "next week"
-                days_until_monday = (7 - start_date.weekday()) % 7 or 7
-                start_date = start_date + timedelta(days=days_until_monday)
-                end_date = start_date + timedelta(days=6)
-            
-            elif 'month' in match.group(0):  # "next month" 
-                next_month = start_date.replace(day=1) + timedelta(days=32)
-                start_date = next_month.replace(day=1)
-                end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            end_date = self.check_bday(end_date)
-            return start_date.isoformat(),end_date.isoformat()
-            
-        else:
-            return None,None
-    def construct_qdrant_date_filter(self,start_date=None, end_date=None, exact_date=None):
+        return check_bday(date)
+    def detect_doc_types(self,query):
+        """Tenants (doc types) a question needs; both when the wording is ambiguous."""
+        text = query.lower()
+        wants_ca = any(term in text for term in CORPORATE_ACTION_TERMS)
+        wants_circ = any(term in text for term in CIRCULAR_TERMS)
+        if wants_ca and not wants_circ:
+            return [CORPORATE_ACTION]
+        if wants_circ and not wants_ca:
+            return [CIRCULAR]
+        return list(DOC_TYPES)
+    def construct_qdrant_date_filter(self,start_date=None, end_date=None, exact_date=None, doc_type=None):
+        if doc_type:
+            # Tenant-scoped filter: one doc type and only its own date field
+            must_conditions = [{"key": DOC_TYPE_FIELD, "match": {"value": doc_type}}]
+            if exact_date:
+                must_conditions.append({"key": DATE_FIELDS[doc_type], "match": {"value": exact_date}})
+            elif start_date and end_date:
+                must_conditions.append({"key": DATE_FIELDS[doc_type], "range": {"gte": start_date, "lte": end_date}})
+            return {"must": must_conditions}
+
         should_conditions = []
 
         if exact_date:
@@ -132,87 +236,264 @@ class RAG:
             "should": should_conditions,
         
         }        
-    def multi_stage_search(self,query: str, limit: int = 1) -> list[dict]:
-        if ('corporate actions' in query.lower()) or('corporate action' in query.lower()) :
-            query = query.replace('corporate actions',"Dividend,Bonus,Rights,Distribution,Buy Back,Face Value,Demerger ")
-        date_search =  search_dates(query)
-
-        start,end =self.fetchDateRange(query)
-
-
-        if start and end:
-            date_filter=self.construct_qdrant_date_filter(start_date=start,end_date=end)
-        elif date_search:
-            date = self.check_bday(date_search[0][1].replace(hour=0, minute=0, second=0, microsecond=0))
-            date_iso = date.isoformat()
-            date_filter=self.construct_qdrant_date_filter(exact_date=date_iso)
-        
-        else:
-            date_filter = self.construct_qdrant_date_filter()
-
-    
-        query_points = self.client.query_points(
-            collection_name="nsechatbot-rag-sparse_dense",
-            prefetch=[
+    def doc_type_of(self,payload):
+        # Points ingested before doc_type tagging: corporate actions carry a symbol
+        return payload.get(DOC_TYPE_FIELD) or (CORPORATE_ACTION if 'symbol' in payload else CIRCULAR)
+    def search_params_for(self,collection_name):
+        """Query-time rescoring for the profile `collection_name` was actually created with, looked up once."""
+        if collection_name not in self.search_params:
+            config = self.client.get_collection(collection_name).config
+            self.search_params[collection_name] = live_search_params(config.quantization_config)
+        return self.search_params[collection_name]
+    def hybrid_query(self,collection_name,query_vectors,limit,date_filter,with_payload=True):
+        """
+        query_points arguments: dense prefetch reranked by BM25 within a single collection/partition.
+        Without a dense vector (degraded requests) it is a plain BM25 search.
+        """
+        dense,sparse = query_vectors
+        return dict(
+            collection_name=collection_name,
+            prefetch=None if dense is None else [
                 models.Prefetch(
-                    query=models.Document(
-                        text=query,
-                        model="BAAI/bge-small-en"
-                    ),
+                    query=dense,
                     using="bge-small-en",
+                    params=self.search_params_for(collection_name),
                     # Prefetch ten times more results, then
                     # expected to return, so we can really rerank
                     limit=(20 * limit),
                 ),
             ],
-            query=models.Document(
-                text=query,
-                model="Qdrant/bm25", 
-            ),
+            query=sparse,
             using="bm25",
             limit=limit,
+            with_payload=with_payload,
+            # Local mode only takes Filter models; the server also parsed plain dicts
+            query_filter=models.Filter(**date_filter)
+        )
+    def hybrid_request(self,collection_name,query_vectors,limit,date_filter,with_payload=True):
+        """The same search as hybrid_query, as one request of a query_batch_points call."""
+        args = self.hybrid_query(collection_name,query_vectors,limit,date_filter,with_payload)
+        return models.QueryRequest(prefetch=args["prefetch"],query=args["query"],using=args["using"],
+                                   limit=limit,with_payload=with_payload,filter=args["query_filter"])
+    def circular_ids(self,hits):
+        """Circular ids to expand into pages, grouped by the partition they were found in."""
+        ids_by_collection = defaultdict(list)
+        for point,collection_name in hits:
+            pdf_id = point.payload.get("id")
+            if pdf_id and self.doc_type_of(point.payload) == CIRCULAR and pdf_id not in ids_by_collection[collection_name]:
+                ids_by_collection[collection_name].append(pdf_id)
+        return {c:ids for c,ids in ids_by_collection.items() if ids}
+    def page_scroll(self,collection_name,ids,exclude=None):
+        """scroll arguments for the pages of the circulars in `ids` in page order, PAGES_PER_CIRCULAR per circular, skipping point ids in `exclude`."""
+        return dict(
+            collection_name=collection_name,
+            scroll_filter=Filter(
+                must=[
+                    FieldCondition(
+                        key='id',
+                        match=MatchAny(any=ids)
+                    )
+                ],
+                must_not=[models.HasIdCondition(has_id=exclude)] if exclude else None
+            ),
+            limit=PAGES_PER_CIRCULAR * len(ids),
+            order_by=models.OrderBy(key="page_number",direction=models.Direction.ASC),
             with_payload=True,
-            query_filter=date_filter
+            with_vectors=False
         )
-        final = []
-        
-        for point in query_points.points:
-            final.append(point.payload)
-
-        pdfs_id = [res.get("id") for res in final]
-        all_related_pages = []
-        for pdf_id in pdfs_id:
-            # Get all pages from each particular PDF
-            if pdf_id:
-                pdf_pages = self.client.scroll(
-                    collection_name="nsechatbot-rag-sparse_dense",
-                    scroll_filter=Filter(
-                        must=[
-                            FieldCondition(
-                                key='id',
-                                match=MatchValue(value=pdf_id)
-                            )
-                        ]
-                    ),
-                    limit=5  ,
-                    with_payload=True,
-                    with_vectors=False  
-                )
-                all_related_pages.extend(pdf_pages[0])  
-            
+    def cap_pages(self,record_lists):
+        pages = []
+        per_circular = defaultdict(int)
+        for records in record_lists:
+            for record in records:
+                if per_circular[record.payload["id"]] < PAGES_PER_CIRCULAR:
+                    per_circular[record.payload["id"]] += 1
+                    pages.append(record)
+        return pages
+    def expand_pages(self,hits):
+        """
+        Fetch the pages of every circular hit with one scroll per partition (MatchAny on
+        `id`) instead of one scroll per hit. Ordering by page_number makes a limit of
+        PAGES_PER_CIRCULAR * circulars return the first pages of each circular; circulars
+        crowded out by multi-document ones are topped up (see scroll_pages).
+        """
+        return self.fetch_pages(self.circular_ids(hits))
+    def scroll_pages(self,collection_name,ids):
+        """
+        Pages of the circulars in `ids` from one partition, at least PAGES_PER_CIRCULAR each where they have them.
+        Zip circulars are stored as several documents whose page numbers all restart at 1, so they
+        can take several slots of the shared limit per page number; circulars left short are scrolled
+        again (without the pages already fetched) until they have their share or run out.
+        """
+        pages,counts = [],defaultdict(int)
+        wanted = list(ids)
+        while wanted:
+            args = self.page_scroll(collection_name,wanted,exclude=[p.id for p in pages if p.payload["id"] in wanted])
+            records = self.client.scroll(**args)[0]
+            pages.extend(records)
+            for record in records:
+                counts[record.payload["id"]] += 1
+            if len(records) < args["limit"]:
+                break
+            wanted = [x for x in wanted if counts[x] < PAGES_PER_CIRCULAR]
+        return pages
+    def fetch_pages(self,ids_by_collection):
+        results = self.pool.map(lambda c: self.scroll_pages(c,ids_by_collection[c]),list(ids_by_collection))
+        return self.cap_pages(results)
+    def rewrite_query(self,query):
+        if ('corporate actions' in query.lower()) or('corporate action' in query.lower()) :
+            query = query.replace('corporate actions',"Dividend,Bonus,Rights,Distribution,Buy Back,Face Value,Demerger ")
+        return query
+    def parse_query(self,query,parse_dates=True):
+        """Rewrite the query and resolve the tenants and date range it targets."""
+        doc_types = self.detect_doc_types(query)
+        query = self.rewrite_query(query)
+        # Rule-based parse; dateparser is only loaded for date-like text the rules miss
+        dates = self.date_parser.parse(query) if parse_dates else self.date_parser.build()
+        return {"query":query,"doc_types":doc_types,**dates}
+    def plan_searches(self,parsed,targets):
+        """One (collection, filter, payload selector) search per partition and tenant."""
+        start,end,exact = parsed["start"],parsed["end"],parsed["exact"]
+        searches = []
+        for collection_name in targets:
+            for doc_type in parsed["doc_types"]:
+                if exact:
+                    date_filter = self.construct_qdrant_date_filter(exact_date=exact,doc_type=doc_type)
+                else:
+                    date_filter = self.construct_qdrant_date_filter(start_date=start,end_date=end,doc_type=doc_type)
+                # Circular hits are only used to find their pages, corporate actions go to the prompt as is
+                with_payload = CIRCULAR_HIT_FIELDS if doc_type == CIRCULAR else True
+                searches.append((collection_name,date_filter,with_payload))
+        return searches
+    def merge_hits(self,searches,results,limit):
+        """
+        Best `limit` hits across the partition/tenant searches by reciprocal rank fusion. BM25 IDF is
+        computed per collection, so raw scores from partitions of different sizes can't be compared;
+        each hit is scored 1/(RRF_K + its rank in its own search), equal ranks going to the higher raw score.
+        """
+        ranked = []
+        for (collection_name,_,_),points in zip(searches,results):
+            for rank,point in enumerate(points,1):
+                ranked.append((1 / (RRF_K + rank),point.score,point,collection_name))
+        ranked.sort(key=lambda x:(x[0],x[1]),reverse=True)
+        return [(point.model_copy(update={"score":fused}),collection_name) for fused,_,point,collection_name in ranked[:limit]]
+    def assemble_results(self,hits,pages):
+        """Pages newest circular first, with corporate-action hits in front. Pages carry their circular's best hit score."""
+        final = [{**point.payload,"score":point.score} for point,_ in hits]
+        scores = {}
+        for point,_ in hits:
+            pdf_id = point.payload.get("id")
+            scores[pdf_id] = max(scores.get(pdf_id,point.score),point.score)
+
+        all_related_pages = list(pages)
         all_related_pages.sort(key=lambda x: (x.payload["id"], x.payload["page_number"]))
         all_related_pages.sort(key=lambda x:x.payload["cirDisplayDate"],reverse=True)
         all_res = []
         for res in all_related_pages:
-            all_res.append(res.payload)
+            all_res.append({**res.payload,"score":scores.get(res.payload["id"],0.0)})
 
         pos = 0
         for res in final:
-            if 'circCategory' not in res.keys():
+            if self.doc_type_of(res) == CORPORATE_ACTION:
                 all_res.insert(pos,res)
                 pos += 1
                 
         return all_res
+    def run_stage(self,deadline,stage,fallback_name,fn,*args,fallback=None):
+        """Run one stage within its share of the request budget; on timeout or error log the degradation and use `fallback`."""
+        if deadline is None:
+            return fn(*args)
+        future = self.stage_pool.submit(fn,*args)
+        try:
+            return future.result(timeout=deadline.timeout(stage))
+        except StageTimeout:
+            deadline.degrade(stage,fallback_name)
+        except Exception as e:
+            deadline.degrade(stage,fallback_name,reason=f"error: {e}")
+        return fallback() if fallback else None
+    def resolve_targets(self,parsed,deadline=None):
+        """Partitions overlapping the date range; a slow alias lookup falls back to the last alias map seen."""
+        version = self.docstore.get_version()
+        return self.run_stage(deadline,"partitions","last known partitions",
+                              self.partitions.resolve,self.client,parsed["start"],parsed["end"],version,
+                              fallback=lambda: self.partitions.resolve_cached(parsed["start"],parsed["end"]) or [])
+    def search(self,searches,query_vectors,limit):
+        """Run the planned searches with one query_batch_points call per partition, then merge them."""
+        by_collection = defaultdict(list)
+        for i,(collection_name,_,_) in enumerate(searches):
+            by_collection[collection_name].append(i)
+
+        def run(collection_name):
+            requests = [self.hybrid_request(collection_name,query_vectors,limit,searches[i][1],searches[i][2]) for i in by_collection[collection_name]]
+            return self.client.query_batch_points(collection_name=collection_name,requests=requests)
+
+        results = [None] * len(searches)
+        for collection_name,responses in zip(list(by_collection),self.pool.map(run,list(by_collection))):
+            for i,response in zip(by_collection[collection_name],responses):
+                results[i] = response.points
+        return self.merge_hits(searches,results,limit)
+    def multi_stage_search(self,query: str, limit: int = 1, parsed=None, deadline=None) -> list[dict]:
+        parsed = parsed or self.parse_query(query)
+
+        # Only search the partitions overlapping the date range (all of them when there is none),
+        # and within each only the tenants the question needs
+        targets = self.resolve_targets(parsed,deadline)
+        searches = self.plan_searches(parsed,targets)
+
+        # Encode once (cached) and reuse the vectors for every partition/tenant search.
+        # A cold or slow dense model degrades to BM25 only, which needs no model inference
+        query_vectors = self.run_stage(deadline,"encoding","bm25-only search",self.encoder.encode,parsed["query"],
+                                       fallback=lambda: self.encoder.encode_sparse(parsed["query"]))
+        sparse_only = (None,query_vectors[1])
+        hits = self.run_stage(deadline,"search","bm25-only search",self.search,searches,query_vectors,limit,
+                              fallback=lambda: self.run_stage(deadline,"search","no results",self.search,searches,sparse_only,limit,fallback=list))
+
+        # Without page expansion each circular hit contributes just its own page
+        pages = self.run_stage(deadline,"expansion","hit pages only",self.expand_pages,hits,
+                               fallback=lambda: [point for point,_ in hits if self.doc_type_of(point.payload) == CIRCULAR])
+        return self.assemble_results(hits,pages)
+    def batch_search(self,parsed_list,vectors_list,limit):
+        """
+        Retrieval for many questions at once: every question's partition/tenant searches
+        go out as one query_batch_points call per partition, and the pages of all circulars
+        hit by any question are fetched once (one scroll per partition).
+
+        Returns:
+            list: Search results per question, as multi_stage_search returns them.
+        """
+        jobs = defaultdict(list)
+        for i,(parsed,query_vectors) in enumerate(zip(parsed_list,vectors_list)):
+            targets = self.resolve_targets(parsed)
+            for search in self.plan_searches(parsed,targets):
+                jobs[search[0]].append((i,search,query_vectors))
+
+        def run(collection_name):
+            requests = [self.hybrid_request(collection_name,query_vectors,limit,date_filter,with_payload)
+                        for _,(_,date_filter,with_payload),query_vectors in jobs[collection_name]]
+            return collection_name,self.client.query_batch_points(collection_name=collection_name,requests=requests)
+
+        searches = defaultdict(list)
+        for collection_name,responses in self.pool.map(run,list(jobs)):
+            for (i,search,_),response in zip(jobs[collection_name],responses):
+                searches[i].append((search,response.points))
+        hits = [self.merge_hits([s for s,_ in searches[i]],[p for _,p in searches[i]],limit) for i in range(len(parsed_list))]
+
+        # Shared context: a circular hit by several questions is fetched once
+        ids_by_collection = defaultdict(list)
+        for question_hits in hits:
+            for collection_name,ids in self.circular_ids(question_hits).items():
+                ids_by_collection[collection_name].extend(x for x in ids if x not in ids_by_collection[collection_name])
+        pages_by_id = defaultdict(list)
+        for page in self.fetch_pages(dict(ids_by_collection)):
+            pages_by_id[page.payload["id"]].append(page)
+        logger.info(f"Batch search: {len(parsed_list)} questions, {sum(len(j) for j in jobs.values())} searches "
+                    f"in {len(jobs)} round trip(s), {len(pages_by_id)} unique circulars")
+
+        results = []
+        for question_hits in hits:
+            ids = dict.fromkeys(x for ids in self.circular_ids(question_hits).values() for x in ids)
+            results.append(self.assemble_results(question_hits,[page for x in ids for page in pages_by_id[x]]))
+        return results
     def get_unique_circulars_with_all_pages(self,circulars, n=5):
         """
         Returns n unique circulars with ALL their pages included.
@@ -222,8 +503,8 @@ class RAG:
         circular_groups = defaultdict(list)
         
         for circular in circulars:
-            # Use file link as unique circular identifier
-            circular_id = circular.get('circFilelink', '')
+            # Use the circular id (file link for older points) as unique circular identifier
+            circular_id = circular.get('id') or circular.get('circFilelink', '')
             circular_groups[circular_id].append(circular)
         
         # Get first n unique circulars with all their pages
@@ -234,158 +515,224 @@ class RAG:
         return result
     
     def build_prompt(self,query, search_results):
-        prompt_template = """You are an expert assistant specializing in NSE (National Stock Exchange of India) circulars.
-
-        ### INSTRUCTIONS
-        - Answer using ONLY the information from the circular excerpts provided below.
-        - Provide answers in a direct, natural conversational style as if the information is your own knowledge.
-        - Do NOT mention document names, circular numbers, excerpts, or references in your response body.
-        - Do NOT use phrases like "based on the provided circulars", "according to the documents", "CIRCULAR X states", or similar meta-references.
-        - If multiple excerpts are from the same source, combine them coherently without citing the source.
-        - Present information clearly and directly without repeatedly citing document structure.
-        - When data is comparative or structured, use markdown tables for better readability.
-        - Extract and present only relevant information. Reproduce full tables only when necessary for clarity.
-        - Use the most recent information when there are conflicting details across different circulars.
-        - Maintain a factual, neutral tone and speak authoritatively about the information.
-        - Always identify and clearly present any corporate actions such as record dates, ex-dates, payment dates, rights issues, dividends, stock splits, etc., when mentioned in the circulars, regardless of whether the question explicitly asks about them.
-        - When multiple important dates related to corporate actions (e.g., record date, ex-date, payment date) are present, list all clearly and distinctly.
-        - Given a date in ISO 8601 format (e.g., 2025-12-05T00:00:00), convert it to a readable format: "Month Day, Year" (like December 5, 2025). 
-            For example:
-            Input: 2025-11-05T00:00:00
-            Output: November 5, 2025
-
-        ### CLASSIFICATION GUIDELINES
-        - Non-Business Days refer ONLY to calendar dates or days when markets/operations are closed
-        - Securities, funds, and financial instruments are NEVER categories of days
-        - When answering questions about business days, focus exclusively on temporal information
-        - Distinguish between: (1) What is being discussed (e.g., mutual funds), and (2) When it applies (e.g., business days)
-
-        ### STRICT RULES
-        1. Do NOT use external knowledge or make assumptions beyond what's provided.
-        2. Do NOT modify stock symbols, index names, or any codes - use them exactly as written.
-        3. Do NOT invent data or speculate.
-        4. If URLs are mentioned in the content, output them as plain text (no markdown/HTML formatting).
-        5. Avoid repeating the same information multiple times.
-        6. NEVER reference the document structure, excerpt numbers, or circular labels in your answer.
-        7. Write as if you naturally know this information - do not mention your sources or say "the circular states" or "according to the document".
-        8. If NO relevant information is found in the provided context after thorough review, respond with EXACTLY: "The provided circulars do not contain this information."
-        9. Otherwise, provide a direct answer without any meta-commentary about where the information came from.
-
-        ### REASONING PROCESS
-        Before answering:
-        1. Identify which excerpts relate to the question
-        2. Extract key facts from those excerpts
-        3. Synthesize the information into a clear answer
-        4. Verify your answer is supported by the provided context
-
-        ### VALIDATION CHECKLIST
-        Before finalizing your answer, verify:
-        - Have I confused an entity type (fund, security, index) with a time classification?
-        - Does my answer logically match the question category?
-        - If the question asks about dates/schedules, is my answer exclusively about temporal information?
-        - If answering about mutual funds, am I describing fund categories/characteristics (correct) or treating them as time periods (incorrect)?
-
-        ### CONTEXT
-        {context}
-
-        ### QUESTION
-        {query}
-
-        
-
-        
-        ### ANSWER""".strip()
-
-        
-        context = ""
-        grouped = defaultdict(list)
-
-        # Group by document name if available, else by type placeholder
-        for item in search_results:
-            # Use document_name or compose a label based on type keys for grouping
-            if 'document_name' in item:
-                group_key = item['document_name']
-            elif 'symbol' in item:
-                group_key = f"Corporate Action: {item.get('symbol', 'N/A')}"
-            else:
-                group_key = "Unknown Document Type"
-            grouped[group_key].append(item)
-
-        # Build structured context
-        for idx, (group_key, items) in enumerate(grouped.items(), 1):
-            context += f"=== DOCUMENT {idx}: {group_key} ===\n\n"
-
-            first_item = items[0]
-
-            # Distinguish corporate actions by presence of 'symbol' and no 'content'
-            if 'symbol' in first_item:
-                context += f"Symbol: {first_item.get('symbol', 'N/A')}\n"
-                context += f"Series: {first_item.get('series', 'N/A')}\n"
-                context += f"Face Value: {first_item.get('faceVal', 'N/A')}\n"
-                context += f"Subject: {first_item.get('subject', 'N/A')}\n"
-                context += f"Ex-Date: {first_item.get('exDate', 'N/A')}\n"
-                context += f"Company: {first_item.get('comp', 'N/A')}\n"
-
-            # Circulars have 'content' field with document details
-            elif 'content' in first_item:
-                # Include circular metadata (some from first_item)
-                context += f"Subject: {first_item.get('sub', 'N/A')}\n"
-                context += f"Date: {first_item.get('cirDisplayDate', 'N/A')}\n"
-                context += f"File Link: {first_item.get('circFilelink', 'N/A')}\n"
-                context += f"Department: {first_item.get('circDepartment', 'N/A')}\n"
-                context += f"Category: {first_item.get('circCategory', 'N/A')}\n"
-                context += f"\nContent:\n"
-
-                # Add all content pages in this group
-                for page_num, item in enumerate(items, 1):
-                    page_content = item.get('content', '').strip()
-                    if page_content:
-                        if len(items) > 1:
-                            context += f"\n[Page {page_num}]\n"
-                        context += f"{page_content}\n"
-
-            else:
-                # Generic fallback for unknown structures
-                context += "No structured content found for this document.\n"
-
-            context += f"\n{'='*60}\n\n"
-
-        
-        return prompt_template.format(query=query, context=context).strip()
+        """Per-question user message (context + question); the instructions live in SYSTEM_PROMPT."""
+        # Slim payloads only carry filterable fields; pull metadata and page text in one batched read
+        search_results = self.docstore.hydrate(search_results)
+
+        # Budgeted, deduplicated context ranked by retrieval score
+        context, stats = self.packer.pack(search_results)
+        prompt = QUESTION_TEMPLATE.format(query=query, context=context)
+        stats["prompt_tokens"] = count_tokens(SYSTEM_PROMPT) + count_tokens(prompt)
+        self.packer.record(stats["prompt_tokens"])
+        logger.info(f"Prompt packed: {stats}")
+        return prompt
     
-    def rag_streaming(self, query,chat_history, top_k=15):
-
-        search_results = self.multi_stage_search(query, top_k)
+    def build_messages(self,query,history,search_results):
+        """
+        Args:
+            history (list): Token-bounded history view from self.memory.messages.
+        """
         results = self.get_unique_circulars_with_all_pages(search_results)
 
         prompt = self.build_prompt(query, results)
      
-        # Build messages list with history
-        messages = []
+        # Static instructions first so every request shares the same cacheable prefix
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
         
-        # Add recent chat history (limit to last N messages)
-        messages.extend(chat_history[-self.max_history:])
+        # Add token-bounded chat history
+        messages.extend(history)
         
         # Add current user query
         messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def answer_key(self,query,parsed,history=None):
+        # The date range is resolved relative to today, so "next 3 days" asked tomorrow is a different key
+        version = self.docstore.get_version()
+        # The prompt carries the history view, so a follow-up ("what is its record date?") is only
+        # shared between conversations that send the same history; None for a fresh conversation
+        context = hashlib.sha1(json.dumps(history,sort_keys=True).encode()).hexdigest() if history else None
+        return (normalize(query),parsed["start"],parsed["end"],parsed["exact"],tuple(parsed["doc_types"]),context,version)
+
+    def cached_answer(self,key):
+        answer = self.answer_cache.get(key)
+        if answer is None:
+            answer = self.docstore.get_answer(key,key[-1],self.answer_store_ttl)
+            if answer is not None:
+                self.answer_cache.put(key,answer)
+        return answer
+
+    def cache_answer(self,key,answer):
+        self.answer_cache.put(key,answer)
+        self.docstore.put_answer(key,key[-1],answer)
+
+    def replay(self,answer,chunk_size=40):
+        for start in range(0,len(answer),chunk_size):
+            yield answer[start:start + chunk_size]
+
+    def completion_args(self):
+        """Extra chat.completions.create arguments; model, messages and stream are set by the caller."""
+        if self.report_usage:
+            return {"stream_options": {"include_usage": True}}
+        return {}
+
+    def excerpt_answer(self,search_results,n=5):
+        """Fallback answer when generation misses its deadline: the top retrieved circulars and corporate actions."""
+        lines = ["The answer could not be generated in time. The most relevant information found:\n"]
+        seen = set()
+        for item in self.docstore.hydrate(self.get_unique_circulars_with_all_pages(search_results,n)):
+            if 'symbol' in item:
+                lines.append(f"- **{item.get('symbol')}** ({item.get('comp', 'N/A')}): {item.get('subject', 'N/A')}, ex-date {item.get('exDate', 'N/A')}")
+                continue
+            circular_id = item.get('id') or item.get('circFilelink')
+            if circular_id in seen:
+                continue
+            seen.add(circular_id)
+            excerpt = " ".join(item.get('content','').split())[:300]
+            lines.append(f"- **{item.get('sub', item.get('document_name', 'Circular'))}** ({item.get('cirDisplayDate', 'N/A')}) {item.get('circFilelink', '')}\n  {excerpt}")
+        if len(lines) == 1:
+            return STOP_PHRASE
+        return "\n".join(lines)
+
+    def rag_streaming(self, query,chat_history, top_k=15, session_id="default", on_wait=None):
+        """
+        Stream the answer to `query`.
+
+        Args:
+            session_id (str): Caller's session, for fair queuing of LLM calls.
+            on_wait (callable): Called with the 1-based queue position while waiting for an LLM slot.
+        """
+
+        # Per-request latency budget; each stage that runs out of time falls back instead of hanging
+        deadline = Deadline()
+        parsed = self.run_stage(deadline,"date_parsing","no date filter",self.parse_query,query,
+                                fallback=lambda: self.parse_query(query,parse_dates=False))
+        history = self.memory.messages(chat_history,query)
+        key = self.answer_key(query,parsed,history)
+        cached = self.cached_answer(key)
+        if cached is not None:
+            yield from self.replay(cached)
+            return
+        # Drop answers computed against an older collection version
+        self.answer_cache.invalidate(keep=lambda k: k[-1] == key[-1])
+
+        producer = lambda flight: self.generate(query,history,top_k,parsed,key,deadline,session_id,flight)
+        yield from self.flights.stream(key,producer,on_wait=on_wait)
+
+    def generate(self,query,history,top_k,parsed,key,deadline,session_id="default",flight=None):
+        """Retrieval and LLM stream for one question; shared by every subscriber of its flight."""
+        search_results = self.multi_stage_search(query, top_k, parsed=parsed, deadline=deadline)
+        messages = self.build_messages(query,history,search_results)
+        yield from self.stream_answer(query,messages,search_results,key,deadline,session_id,flight)
+
+    def stream_answer(self,query,messages,search_results,key,deadline,session_id="default",flight=None):
+        """Every LLM call goes through here, so each one holds a FairLimiter slot while it streams."""
+        # Wait for an LLM slot; time in the queue counts against the generation budget
+        ticket = self.limiter.enqueue(session_id)
+        if flight is not None:
+            flight.ticket = ticket
+        if not self.limiter.wait(ticket,timeout=max(deadline.remaining(),1.0)):
+            deadline.degrade("generation","retrieved excerpts",reason="queue timeout")
+            yield self.excerpt_answer(search_results)
+            deadline.report(query)
+            return
+
+        try:
+            yield from self.stream_completion(query,messages,search_results,key,deadline)
+        finally:
+            self.limiter.release()
+
+    def stream_completion(self,query,messages,search_results,key,deadline):
+        # Stream response; the rest of the budget bounds the time to first token
+        stream = self.router.stream(messages,first_token_timeout=max(deadline.remaining(),1.0),**self.completion_args())
         
-        # Stream response
-        stream = self.chat_client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            stream=True
-        )
-        
-        stop_phrase = "The provided circulars do not contain this information."
-        output = ""
+        watcher = StopPhraseWatcher()
+        output = []
         
-        for event in stream:
-            if event.choices[0].delta.content is not None:
+        try:
+            first = next(stream)
+        except TimeoutError:
+            deadline.degrade("generation","retrieved excerpts")
+            yield self.excerpt_answer(search_results)
+            deadline.report(query)
+            return
+        except StopIteration:
+            first = None
+
+        for event in (chain([first],stream) if first is not None else stream):
+            if getattr(event, "usage", None):
+                self.usage.record(event.usage)
+            if event.choices and event.choices[0].delta.content is not None:
                 chunk = event.choices[0].delta.content
-                output += chunk
+                output.append(chunk)
                 yield chunk
                 
-                if stop_phrase in output:
+                if watcher.feed(chunk):
                     break
-        
-        
\ No newline at end of file
+
+        # Only complete answers are cached (an abandoned stream never gets here), and never degraded ones
+        if not deadline.report(query):
+            self.cache_answer(key,"".join(output))
+
+    def sources(self,search_results,n=5):
+        sources = []
+        for item in self.get_unique_circulars_with_all_pages(search_results,n):
+            if 'symbol' in item:
+                source = {"symbol":item.get('symbol'),"subject":item.get('subject'),"exDate":item.get('exDate')}
+            else:
+                source = {"id":item.get('id'),"subject":item.get('sub'),"date":item.get('cirDisplayDate'),"link":item.get('circFilelink')}
+            if source not in sources:
+                sources.append(source)
+        return sources
+
+    def answer_batch(self,questions,top_k=15,concurrency=4):
+        """
+        Answer a list of questions in one pass (daily digests).
+
+        Questions are encoded in one batch and retrieved together (batch_search). Their
+        context is hydrated once, and answers are generated concurrently, at most
+        `concurrency` at a time. Generation also shares the LLM limiter with interactive
+        sessions as session "batch". Answers go through the answer cache like interactive ones.
+
+        Returns:
+            list: {"question", "answer", "sources", "start", "end", "degraded", "elapsed_s"} per question.
+        """
+        start = time.perf_counter()
+        parsed_list = [self.parse_query(question) for question in questions]
+        vectors_list = self.encoder.encode_batch([parsed["query"] for parsed in parsed_list])
+        results_list = self.batch_search(parsed_list,vectors_list,top_k)
+
+        # Hydrate every question's context in one read; circulars shared by questions are read once
+        flat = self.docstore.hydrate([r for results in results_list for r in results])
+        hydrated, offset = [], 0
+        for results in results_list:
+            hydrated.append(flat[offset:offset + len(results)])
+            offset += len(results)
+        logger.info(f"Batch retrieval for {len(questions)} questions took {time.perf_counter() - start:.2f}s")
+
+        budget = float(os.getenv("BATCH_REQUEST_BUDGET", 120))
+        def answer(i):
+            question_start = time.perf_counter()
+            question, parsed, results = questions[i], parsed_list[i], hydrated[i]
+            key = self.answer_key(question,parsed)
+            degraded = []
+            text = self.cached_answer(key)
+            if text is None:
+                deadline = Deadline(budget)
+                messages = self.build_messages(question,[],results)
+                text = "".join(self.stream_answer(question,messages,results,key,deadline,session_id="batch"))
+                degraded = deadline.degraded
+            return {
+                "question": question,
+                "answer": text,
+                "sources": self.sources(results),
+                "start": parsed["start"],
+                "end": parsed["end"],
+                "degraded": degraded,
+                "elapsed_s": round(time.perf_counter() - question_start, 2),
+            }
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            answers = list(executor.map(answer,range(len(questions))))
+        logger.info(f"Answered {len(questions)} questions in {time.perf_counter() - start:.2f}s")
+        return answers
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import signal
+import logging
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+from src.rag import RAG, coalesce_chunks
+from src.vectorstore import BACKENDS, client_stats
+from src.warmup import warm_up
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# No authentication and every /answer/stream request is a paid LLM call, so only
+# listen on other interfaces when asked to (--host / RAG_HOST)
+DEFAULT_HOST = "127.0.0.1"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+DEFAULT_PORT = 8000
+MAX_BODY = 1 << 20
+
+rag_system = None
+
+
+def load_rag_system(backend=None):
+    """One RAG per worker process, shared by all its request threads, warmed up (retrieval only) before serving."""
+    global rag_system
+    if rag_system is None:
+        rag_system = RAG(backend=backend)
+        try:
+            warm_up(rag_system, answers=False)
+        except Exception as e:
+            logger.warning(f"Warm-up failed: {e}")
+    return rag_system
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        GET  /health         worker status, Qdrant client, encoder and answer cache stats
+        POST /search         {"query", "top_k"} -> retrieved circular pages and corporate actions as JSON
+        POST /answer/stream  {"query", "history", "top_k", "session_id"} -> answer streamed as server-sent events
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status, body):
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ValueError("Request body too large")
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict) or not str(body.get("query", "")).strip():
+            raise ValueError("Body must be a JSON object with a non-empty 'query'")
+        return body
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self.send_json(404, {"error": f"Unknown path {self.path}"})
+        self.send_json(200, {
+            "status": "ok",
+            "pid": os.getpid(),
+            "qdrant": client_stats(),
+            "encoder": rag_system.encoder.stats(),
+            "answer_cache": rag_system.answer_cache.stats(),
+            "prompt": rag_system.packer.stats(),
+            "llm_usage": rag_system.usage.stats(),
+            "llm_router": rag_system.router.stats(),
+            "coalescing": rag_system.flights.stats(),
+            "llm_queue": rag_system.limiter.stats(),
+        })
+
+    def do_POST(self):
+        try:
+            body = self.read_json()
+        except (ValueError, json.JSONDecodeError) as e:
+            return self.send_json(400, {"error": str(e)})
+
+        if self.path == "/search":
+            self.search(body)
+        elif self.path == "/answer/stream":
+            self.stream_answer(body)
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def search(self, body):
+        start = time.perf_counter()
+        try:
+            parsed = rag_system.parse_query(body["query"])
+            results = rag_system.multi_stage_search(body["query"], int(body.get("top_k", 15)), parsed=parsed)
+            results = rag_system.docstore.hydrate(results)
+        except Exception as e:
+            logger.exception("Search failed")
+            return self.send_json(500, {"error": str(e)})
+        self.send_json(200, {
+            "query": body["query"],
+            "parsed": parsed,
+            "results": results,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    def send_event(self, data, event=None):
+        message = f"event: {event}\n" if event else ""
+        message += f"data: {json.dumps(data)}\n\n"
+        self.wfile.write(message.encode())
+        self.wfile.flush()
+
+    def stream_answer(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        start = time.perf_counter()
+        first_token = None
+        try:
+            stream = rag_system.rag_streaming(
+                body["query"], body.get("history", []), top_k=int(body.get("top_k", 15)),
+                session_id=str(body.get("session_id") or self.client_address[0]),
+                on_wait=lambda position: self.send_event({"queue_position": position}, event="queue"),
+            )
+            for chunk in coalesce_chunks(stream):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                self.send_event({"delta": chunk})
+            self.send_event({
+                "ttft_ms": round((first_token or 0) * 1000, 2),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+            }, event="done")
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected mid-stream")
+        except Exception as e:
+            logger.exception("Answer stream failed")
+            try:
+                self.send_event({"error": str(e)}, event="error")
+            except OSError:
+                pass
+
+
+def serve(server, backend=None):
+    load_rag_system(backend)
+    logger.info(f"Worker {os.getpid()} serving on {server.server_address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def run(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=1, backend=None):
+    """
+    Bind once, then fork `workers` processes that accept on the shared socket.
+    Each worker loads its own RAG (models, Qdrant connection pool) after the
+    fork and answers requests on threads. Local mode locks its folder, so the
+    embedded `local` backend is limited to one worker.
+    """
+    if workers > 1 and (backend or os.getenv("QDRANT_BACKEND", "server")) != "server":
+        logger.warning("Embedded Qdrant backends cannot be shared across processes, using 1 worker")
+        workers = 1
+
+    if host not in LOOPBACK_HOSTS:
+        logger.warning(f"Listening on {host} without authentication; anyone who can reach it can run LLM calls")
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    if workers == 1:
+        return serve(server, backend)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            serve(server, backend)
+            os._exit(0)
+        children.append(pid)
+    print(f"Serving on http://{host}:{port} with {workers} workers")
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless HTTP service for the RAG engine")
+    parser.add_argument("--host", type=str, default=os.getenv("RAG_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RAG_PORT", DEFAULT_PORT)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("RAG_WORKERS", 1)))
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    run(host=args.host, port=args.port, workers=args.workers, backend=args.backend)
@@ -0,0 +1,99 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """Chunks of one in-flight answer, buffered so subscribers that join late still get the whole stream."""
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        # Set by the producer while it waits for an LLM slot, so subscribers can show their queue position
+        self.ticket = None
+        self.cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def subscribe(self, on_wait=None, interval=0.5):
+        index = 0
+        while True:
+            position = 0
+            with self.cond:
+                if index >= len(self.chunks) and not self.done:
+                    self.cond.wait(interval if on_wait else None)
+                    ticket = self.ticket
+                    if on_wait and ticket is not None:
+                        position = ticket.position()
+                pending = self.chunks[index:]
+                index = len(self.chunks)
+                done, error = self.done, self.error
+            # Report outside the lock; on_wait may write to a slow client
+            if position:
+                on_wait(position)
+            yield from pending
+            if done and index >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests onto one producer.
+
+    The first request for a key starts `producer(flight)` on a background
+    thread and every request for that key while it runs (the first one
+    included) subscribes to the same chunks. The producer always runs to completion,
+    so one subscriber disconnecting doesn't cut the stream for the others.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def run(self, key, flight, producer):
+        error = None
+        try:
+            for chunk in producer(flight):
+                flight.publish(chunk)
+        except Exception as e:
+            logger.exception(f"Shared request failed for {flight.subscribers} subscriber(s)")
+            error = e
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.finish(error)
+
+    def stream(self, key, producer, on_wait=None):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight()
+                self.flights[key] = flight
+                self.started += 1
+            else:
+                self.coalesced += 1
+            flight.subscribers += 1
+        if leader:
+            threading.Thread(target=self.run, args=(key, flight, producer), daemon=True).start()
+        else:
+            logger.info(f"Joined in-flight request ({flight.subscribers} subscribers)")
+        return flight.subscribe(on_wait)
+
+    def stats(self):
+        with self.lock:
+            return {"started": self.started, "coalesced": self.coalesced, "in_flight": len(self.flights)}
@@ -0,0 +1,220 @@
+import os
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+import httpx
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("server", "local", "memory")
+DEFAULT_URL = "http://localhost:6333"
+DEFAULT_LOCAL_PATH = "./data/qdrant_local"
+
+# Calls that are safe to repeat after a transient failure
+RETRYABLE = {
+    "query_points", "query_points_groups", "query_batch_points", "search", "scroll", "retrieve",
+    "count", "get_collection", "get_collections", "collection_exists", "get_aliases",
+    "upsert", "set_payload",
+}
+
+clients = {}
+clients_lock = threading.Lock()
+
+
+def server_settings():
+    """Transport settings for the server backend, read from the environment."""
+    return {
+        "url": os.getenv("QDRANT_URL", DEFAULT_URL),
+        "grpc_port": int(os.getenv("QDRANT_GRPC_PORT", 6334)),
+        "prefer_grpc": os.getenv("QDRANT_PREFER_GRPC", "false").lower() in ("1", "true", "yes"),
+        "timeout": int(os.getenv("QDRANT_TIMEOUT", 30)),
+        "pool_size": int(os.getenv("QDRANT_POOL_SIZE", 20)),
+        "retries": int(os.getenv("QDRANT_RETRIES", 3)),
+        "retry_backoff": float(os.getenv("QDRANT_RETRY_BACKOFF", 0.2)),
+    }
+
+
+class ClientStats:
+    """Per-method call/latency counters and REST connection reuse."""
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.requests = 0
+        self.connections = set()
+
+    def record(self, method, elapsed, error=False):
+        with self.lock:
+            self.calls[method] += 1
+            self.latencies[method].append(elapsed)
+            if error:
+                self.errors[method] += 1
+
+    def snapshot(self):
+        with self.lock:
+            methods = {}
+            for method, calls in self.calls.items():
+                lat = list(self.latencies[method])
+                methods[method] = {
+                    "calls": calls,
+                    "errors": self.errors[method],
+                    "retries": self.retries[method],
+                    "p50_ms": round(float(np.percentile(lat, 50)) * 1000, 2) if lat else 0.0,
+                    "p99_ms": round(float(np.percentile(lat, 99)) * 1000, 2) if lat else 0.0,
+                }
+            opened = len(self.connections)
+            return {
+                "methods": methods,
+                "http_requests": self.requests,
+                "http_connections_opened": opened,
+                "connection_reuse": round(1 - opened / self.requests, 4) if self.requests else 0.0,
+            }
+
+
+class TrackingTransport(httpx.HTTPTransport):
+    """httpx transport that records which pooled connections served requests."""
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request):
+        response = super().handle_request(request)
+        with self.stats.lock:
+            self.stats.requests += 1
+            for connection in getattr(self._pool, "connections", []):
+                self.stats.connections.add(id(connection))
+        return response
+
+
+class InstrumentedClient:
+    """
+    Thin proxy over QdrantClient that times every call and retries transient
+    failures (connection errors, timeouts, 429/5xx) with exponential backoff.
+    """
+    def __init__(self, client, stats, retries=0, retry_backoff=0.2):
+        self.client = client
+        self.stats = stats
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            attempts = self.retries + 1 if name in RETRYABLE else 1
+            for attempt in range(attempts):
+                start = time.perf_counter()
+                try:
+                    result = attr(*args, **kwargs)
+                    self.stats.record(name, time.perf_counter() - start)
+                    return result
+                except Exception as e:
+                    self.stats.record(name, time.perf_counter() - start, error=True)
+                    if attempt + 1 >= attempts or not self.transient(e):
+                        raise
+                    with self.stats.lock:
+                        self.stats.retries[name] += 1
+                    logger.warning(f"Qdrant {name} failed ({e}), retry {attempt + 1}/{attempts - 1}")
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+        return call
+
+    @staticmethod
+    def transient(error):
+        if isinstance(error, (ResponseHandlingException, httpx.TransportError)):
+            return True
+        if isinstance(error, UnexpectedResponse):
+            return error.status_code == 429 or error.status_code >= 500
+        code = getattr(error, "code", None)
+        if callable(code):  # grpc.RpcError
+            try:
+                return code().name in ("UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED")
+            except Exception:
+                return False
+        return False
+
+
+stats = ClientStats()
+
+
+def client_stats():
+    """Latency, retry and connection-reuse stats for all clients created by get_client."""
+    return stats.snapshot()
+
+
+def get_client(backend=None, path=None, url=None):
+    """
+    Return the Qdrant client for the configured backend.
+
+    Backends:
+        server: Qdrant over REST (the Docker container managed by QdrantManager).
+        local:  qdrant-client local mode persisted at `path`, no Docker or network.
+        memory: qdrant-client local mode held in memory (CI, benchmarks).
+
+    Clients are cached per backend/location so ingestion and queries in one
+    process share the same instance and connection pool (required for
+    `memory`). Local mode locks its folder, so only one process can open a
+    `local` store at a time. Server transport (gRPC preference, timeout, pool
+    size, retries) comes from server_settings().
+
+    Args:
+        backend (str): One of BACKENDS, defaults to QDRANT_BACKEND or "server".
+        path (str): Storage folder for `local`, defaults to QDRANT_PATH.
+        url (str): Server URL for `server`, defaults to QDRANT_URL.
+    """
+    backend = backend or os.getenv("QDRANT_BACKEND", "server")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown Qdrant backend '{backend}'. Choose from {BACKENDS}")
+
+    if backend == "memory":
+        key = (backend, ":memory:")
+    elif backend == "local":
+        key = (backend, path or os.getenv("QDRANT_PATH", DEFAULT_LOCAL_PATH))
+    else:
+        key = (backend, url or os.getenv("QDRANT_URL", DEFAULT_URL))
+
+    with clients_lock:
+        if key not in clients:
+            retries, retry_backoff = 0, 0.2
+            if backend == "memory":
+                client = QdrantClient(location=":memory:")
+            elif backend == "local":
+                client = QdrantClient(path=key[1])
+            else:
+                settings = server_settings()
+                pool = settings["pool_size"]
+                client = QdrantClient(
+                    url=key[1],
+                    grpc_port=settings["grpc_port"],
+                    prefer_grpc=settings["prefer_grpc"],
+                    timeout=settings["timeout"],
+                    transport=TrackingTransport(
+                        stats,
+                        limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+                    ),
+                    grpc_options={"grpc.keepalive_time_ms": 30000},
+                )
+                retries, retry_backoff = settings["retries"], settings["retry_backoff"]
+            clients[key] = InstrumentedClient(client, stats, retries=retries, retry_backoff=retry_backoff)
+            logger.info(f"Qdrant client created for {backend} backend ({key[1]})")
+        return clients[key]
+
+
+def close_client(client):
+    """Close a cached client and forget it (releases the folder lock in local mode)."""
+    with clients_lock:
+        for key, cached in list(clients.items()):
+            if cached is client:
+                del clients[key]
+    client.close()
+
+
+def uses_server(backend=None):
+    return (backend or os.getenv("QDRANT_BACKEND", "server")) == "server"
@@ -0,0 +1,63 @@
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERIES = [
+    "upcoming corporate actions in the next 7 days",
+    "upcoming dividends",
+    "latest circulars",
+    "latest surveillance circulars",
+    "latest F&O derivative circulars",
+    "latest compliance circulars",
+    "latest mutual fund circulars",
+]
+
+
+def load_queries():
+    """WARMUP_QUERIES: a file with one question per line, or questions separated by '|'. Defaults to DEFAULT_QUERIES."""
+    value = os.getenv("WARMUP_QUERIES")
+    if not value:
+        return list(DEFAULT_QUERIES)
+    if os.path.isfile(value):
+        with open(value, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    return [q.strip() for q in value.split("|") if q.strip()]
+
+
+def warm_up(rag, queries=None, answers=None):
+    """
+    Run the common questions through `rag` so the first interactive ones hit warm paths.
+
+    Always loads the query models and encodes the questions. It also runs their
+    retrieval (Qdrant segments, alias lookups and docstore pages get read
+    once). With `answers` (WARMUP_ANSWERS, on by default), the answers are
+    generated too and stored in the docstore. Every process (app, service
+    workers) then serves them from cache until the next ingestion or
+    ANSWER_STORE_TTL.
+
+    Returns:
+        dict: Counts and timing of the warm-up.
+    """
+    queries = queries if queries is not None else load_queries()
+    if answers is None:
+        answers = os.getenv("WARMUP_ANSWERS", "true").lower() in ("1", "true", "yes")
+    if not queries:
+        return {"queries": 0}
+
+    start = time.perf_counter()
+    rag.encoder.load()
+    report = {"queries": len(queries), "answers": 0, "degraded": 0}
+    if answers:
+        results = rag.answer_batch(queries)
+        report["answers"] = sum(1 for r in results if r["answer"] and not r["degraded"])
+        report["degraded"] = sum(1 for r in results if r["degraded"])
+    else:
+        parsed_list = [rag.parse_query(q) for q in queries]
+        vectors_list = rag.encoder.encode_batch([p["query"] for p in parsed_list])
+        for results in rag.batch_search(parsed_list, vectors_list, 15):
+            rag.docstore.hydrate(results)
+    report["elapsed_s"] = round(time.perf_counter() - start, 2)
+    logger.info(f"Warm-up done: {report}")
+    return report
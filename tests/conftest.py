@@ -0,0 +1,67 @@
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+
+class StubLLMServer:
+    """
+    Local OpenAI-compatible /chat/completions server that streams `tokens`
+    chunks after `ttft` seconds and fails a `fail_rate` share of requests
+    with a 500. For exercising LLMRouter without a provider.
+    """
+    def __init__(self, ttft=0.2, fail_rate=0.0, tokens=20, token_delay=0.005, seed=0):
+        rng = random.Random(seed)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                stub.requests += 1
+                if rng.random() < stub.fail_rate:
+                    self.send_response(500)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                time.sleep(stub.ttft)
+                for i in range(stub.tokens):
+                    chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                             "choices": [{"index": 0, "delta": {"content": f"token{i} "}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(stub.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        self.ttft, self.fail_rate, self.tokens, self.token_delay = ttft, fail_rate, tokens, token_delay
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_llm():
+    """stub_llm(name=dict(ttft=..., ...), ...) -> {name: StubLLMServer}, closed after the test."""
+    started = []
+
+    def start(**specs):
+        servers = {name: StubLLMServer(**spec) for name, spec in specs.items()}
+        started.extend(servers.values())
+        return servers
+
+    yield start
+    for stub in started:
+        stub.close()
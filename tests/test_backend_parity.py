@@ -0,0 +1,220 @@
+"""
+Parity of the embedded Qdrant backends with the server.
+
+The same circulars and corporate actions are ingested with EmbedContent into
+each backend. RAG retrieval (hybrid dense prefetch + BM25 query, doc_type/date
+filters, partition aliases, page scrolls ordered by page_number and
+query_batch_points) must then return the same results. The `memory` backend is
+the reference: the `local` backend always runs, the server only when
+QDRANT_URL answers.
+"""
+import json
+import uuid
+from datetime import datetime as dt, timedelta
+import httpx
+import pytest
+
+pytest.importorskip("qdrant_client")
+fastembed = pytest.importorskip("fastembed")
+
+from qdrant_client import models
+from src.embedding import EmbedContent
+from src.encoder import DENSE_MODEL, SPARSE_MODEL
+from src.partitions import PartitionScheme
+from src.rag import RAG
+from src.vectorstore import server_settings
+
+TOP_K = 15
+QUESTIONS = [
+    "upcoming dividend in the next 7 days",
+    "latest surveillance circulars",
+    "F&O lot size revision",
+    "mutual fund scheme categorisation",
+    "corporate actions",
+]
+
+
+def iso(date):
+    return date.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def circular(circular_id, date, subject, department, pages, documents=1):
+    """A circular with `documents` files (a zip circular when more than one), each with `pages`."""
+    return {
+        "id": circular_id,
+        "sub": subject,
+        "cirDisplayDate": iso(date),
+        "circFilelink": f"https://nsearchives.nseindia.com/content/circulars/{circular_id}.pdf",
+        "circDepartment": department,
+        "circCategory": department,
+        "documents": [{f"{circular_id}-{document}.pdf": [
+            {"page_number": number, "page_text": text, "tables": []} for number, text in enumerate(pages, 1)
+        ]} for document in range(1, documents + 1)],
+    }
+
+
+def corporate_action(symbol, company, subject, ex_date):
+    return {"symbol": symbol, "comp": company, "subject": subject, "series": "EQ", "faceVal": "10", "exDate": iso(ex_date)}
+
+
+def write_dataset(folder, today):
+    circulars = [
+        circular("SURV-1", today - timedelta(days=3), "Surveillance measure update", "Surveillance", [
+            "Securities shortlisted under the additional surveillance measure (ASM) framework.",
+            "Surveillance measure stage two applies from the next trading day.",
+        ]),
+        circular("LONG-1", today - timedelta(days=5), "Revision of lot size of F&O contracts", "Futures & Options", [
+            f"Lot size revision for F&O derivative contracts, part {n}. Revised lot size applies to index options."
+            for n in range(1, 8)
+        ]),
+        # Zip circular: four annexures whose page numbers all restart at 1
+        circular("ZIP-1", today - timedelta(days=5), "Lot size of F&O contracts - annexures", "Futures & Options", [
+            f"Annexure: revised lot size of F&O derivative contracts, sheet {n}." for n in range(1, 4)
+        ], documents=4),
+        circular("MF-1", today - timedelta(days=40), "Mutual fund scheme categorisation", "Mutual Fund", [
+            "Categorisation and rationalisation of mutual fund schemes by the mutual fund service system.",
+        ]),
+    ]
+    actions = [
+        corporate_action("DIVCO", "Dividend Company Limited", "Interim Dividend - Rs 5 Per Share", today + timedelta(days=2)),
+        corporate_action("BONUSCO", "Bonus Company Limited", "Bonus 1:1", today + timedelta(days=20)),
+    ]
+    with open(folder / "final_processed_circulars.json", "w") as f:
+        json.dump(circulars, f)
+    with open(folder / "corporate_actions_data.json", "w") as f:
+        json.dump(actions, f)
+
+
+def server_reachable():
+    try:
+        return httpx.get(f"{server_settings()['url']}/readyz", timeout=1).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+def ingest(backend, folder):
+    """Ingest the dataset into its own partition base on `backend` and return a RAG reading it."""
+    base = f"parity-{uuid.uuid4().hex[:8]}"
+    embed = EmbedContent(folder=str(folder), backend=backend, warmup=False)
+    embed.collection_name = base
+    embed.partitions = PartitionScheme(base=base, period="month")
+    embed.embedData()
+    rag = RAG(backend=backend)
+    rag.partitions = PartitionScheme(base=base, period="month", cache_ttl=60)
+    return rag
+
+
+def drop(rag):
+    base = rag.partitions.base
+    for alias in rag.client.get_aliases().aliases:
+        if alias.alias_name.startswith(base):
+            rag.client.update_collection_aliases(change_aliases_operations=[
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias.alias_name))
+            ])
+    for collection in rag.client.get_collections().collections:
+        if collection.name.startswith(base):
+            rag.client.delete_collection(collection.name)
+
+
+def keys(results):
+    return [r.get("page_key") or r.get("symbol") for r in results]
+
+
+def scores(results):
+    return [r["score"] for r in results]
+
+
+@pytest.fixture(scope="module")
+def models_available():
+    try:
+        fastembed.TextEmbedding(DENSE_MODEL)
+        fastembed.SparseTextEmbedding(SPARSE_MODEL)
+    except Exception as e:
+        pytest.skip(f"fastembed models not available: {e}")
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("circulars")
+    write_dataset(folder, dt.today().replace(hour=0, minute=0, second=0, microsecond=0))
+    return folder
+
+
+@pytest.fixture(scope="module")
+def engines(models_available, dataset):
+    """engines(backend) -> RAG over the dataset ingested into that backend (once per module)."""
+    built = {}
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DOCSTORE_PATH", str(dataset / "docstore.sqlite"))
+        patch.setenv("QDRANT_PATH", str(dataset / "qdrant_local"))
+
+        def build(backend):
+            if backend == "server" and not server_reachable():
+                pytest.skip("Qdrant server not reachable")
+            if backend not in built:
+                built[backend] = ingest(backend, dataset)
+            return built[backend]
+
+        yield build
+        for rag in built.values():
+            drop(rag)
+
+
+@pytest.fixture(scope="module")
+def memory(engines):
+    return engines("memory")
+
+
+def test_partitions_are_aliases(memory):
+    targets = memory.partitions.resolve(memory.client)
+    live = memory.partitions.live_partitions(memory.client)
+    assert targets == [live[key] for key in sorted(live)]
+    aliases = {a.alias_name: a.collection_name for a in memory.client.get_aliases().aliases}
+    for key, alias in live.items():
+        assert aliases[alias] == memory.partitions.collection(key)
+
+
+def test_date_and_tenant_filters(memory):
+    # Only corporate actions, and only the one with its ex-date in range
+    assert keys(memory.multi_stage_search("upcoming dividend in the next 7 days", TOP_K)) == ["DIVCO"]
+
+    results = memory.multi_stage_search("latest surveillance circulars", TOP_K)
+    assert results[0]["id"] == "SURV-1"
+    assert "MF-1" not in {r.get("id") for r in results}
+    assert all("symbol" not in r for r in results)
+
+
+def test_pages_expanded_in_order(memory):
+    results = memory.multi_stage_search("F&O lot size revision", TOP_K)
+    pages = [r["page_number"] for r in results if r.get("id") == "LONG-1"]
+    assert pages == [1, 2, 3, 4, 5]
+
+
+def test_multi_document_circular_keeps_others_pages(memory):
+    # The zip circular's annexures share page numbers; it must not crowd out the other circular's pages
+    results = memory.multi_stage_search("F&O lot size revision", TOP_K)
+    assert [r["page_number"] for r in results if r.get("id") == "ZIP-1"] == [1, 1, 1, 1, 2]
+    assert [r["page_number"] for r in results if r.get("id") == "LONG-1"] == [1, 2, 3, 4, 5]
+
+
+def test_batch_search_matches_multi_stage_search(memory):
+    parsed_list = [memory.parse_query(q) for q in QUESTIONS]
+    vectors_list = memory.encoder.encode_batch([p["query"] for p in parsed_list])
+    for question, parsed, results in zip(QUESTIONS, parsed_list, memory.batch_search(parsed_list, vectors_list, TOP_K)):
+        expected = memory.multi_stage_search(question, TOP_K, parsed=parsed)
+        assert keys(results) == keys(expected), question
+        assert scores(results) == pytest.approx(scores(expected)), question
+
+
+@pytest.mark.parametrize("backend", ["local", "server"])
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_backend_matches_memory(engines, memory, backend, question):
+    rag = engines(backend)
+    expected = memory.multi_stage_search(question, TOP_K)
+    results = rag.multi_stage_search(question, TOP_K)
+    assert keys(results) == keys(expected)
+    assert scores(results) == pytest.approx(scores(expected), rel=1e-3)
+
+    parsed = rag.parse_query(question)
+    batch = rag.batch_search([parsed], rag.encoder.encode_batch([parsed["query"]]), TOP_K)[0]
+    assert keys(batch) == keys(expected)
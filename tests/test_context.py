@@ -0,0 +1,97 @@
+"""ContextPacker.pack: token budget, deduplication, trimming and group order."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.context import ContextPacker, count_tokens
+
+DISCLAIMER = "This circular is issued by National Stock Exchange of India Limited for the information of members."
+
+
+def page(circular_id, number, content, score=1.0, document=None):
+    return {
+        "id": circular_id, "page_number": number, "content": content, "score": score,
+        "document_name": document or f"{circular_id}.pdf", "sub": f"Subject of {circular_id}",
+    }
+
+
+def sentence(n):
+    return f"Members are requested to note the revised margin rates for contract number {n} effective today."
+
+
+def test_context_stays_within_budget():
+    packer = ContextPacker(budget=600)
+    results = [page(f"C-{c}", p, "\n".join(sentence(c * 100 + p * 10 + i) for i in range(8)), score=1.0 / (c + 1))
+               for c in range(6) for p in range(1, 4)]
+
+    context, stats = packer.pack(results)
+
+    assert stats["context_tokens"] == count_tokens(context) <= 600
+    assert stats["truncated"] or stats["pages_dropped"]
+    assert "C-0" in context
+
+
+def test_repeated_paragraph_is_packed_once():
+    shared = "Annexure A lists the securities moving to the trade for trade segment."
+    results = [
+        page("C-1", 1, f"{sentence(1)}\n\n{shared}", score=0.9),
+        page("C-2", 1, f"{shared}\n\n{sentence(2)}", score=0.5),
+    ]
+
+    context, stats = ContextPacker(budget=2000).pack(results)
+
+    assert context.count(shared) == 1
+    assert sentence(1) in context and sentence(2) in context
+    assert stats["duplicates_dropped"] == 1
+
+
+def test_repeated_long_line_is_packed_once_short_lines_are_kept():
+    results = [
+        page("C-1", 1, f"Sr. No.\n{DISCLAIMER}\n{sentence(1)}", score=0.9),
+        page("C-2", 1, f"Sr. No.\n{sentence(2)}\n{DISCLAIMER}", score=0.5),
+    ]
+
+    context, stats = ContextPacker(budget=2000).pack(results)
+
+    assert context.count(DISCLAIMER) == 1
+    assert context.count("Sr. No.") == 2
+    assert stats["duplicates_dropped"] == 1
+
+
+def test_single_line_page_is_kept():
+    # A one-line block must not count as a duplicate of itself
+    context, stats = ContextPacker(budget=2000).pack([page("C-1", 1, sentence(1))])
+
+    assert sentence(1) in context
+    assert stats["pages"] == 1 and stats["duplicates_dropped"] == 0
+
+
+def test_page_that_is_one_long_line_is_trimmed_not_dropped():
+    # Flattened tables come through as one line far above the per-page share of the budget
+    line = " ".join(f"SYMBOL{n} 1250 25.50" for n in range(400))
+    packer = ContextPacker(budget=800)
+
+    context, stats = packer.pack([page("C-1", 1, line)])
+
+    assert stats["pages"] == 1 and stats["pages_dropped"] == 0
+    assert stats["truncated"]
+    assert "SYMBOL0 1250 25.50" in context
+    assert "SYMBOL399" not in context
+    assert count_tokens(context) <= 800
+
+
+def test_groups_ordered_by_best_score():
+    results = [
+        page("LOW", 1, sentence(1), score=0.2),
+        page("HIGH", 1, sentence(2), score=0.4),
+        page("HIGH", 2, sentence(3), score=0.9),
+        {"symbol": "DIVCO", "comp": "Dividend Company Limited", "subject": "Dividend", "score": 0.6},
+    ]
+
+    context, stats = ContextPacker(budget=2000).pack(results)
+
+    order = [context.index(marker) for marker in ("HIGH.pdf", "Corporate Action: DIVCO", "LOW.pdf")]
+    assert order == sorted(order)
+    # Pages keep page order within their circular
+    assert context.index(sentence(2)) < context.index(sentence(3))
+    assert stats["groups"] == 3
@@ -0,0 +1,99 @@
+"""
+DateIntentParser rules against a fixed today (Wednesday 2025-11-12).
+
+Range ends and exact dates falling on a weekend move to the next business day.
+"""
+from datetime import datetime as dt
+import pytest
+
+pytest.importorskip("pandas")
+
+from src.dateintent import DateIntentParser
+
+TODAY = dt(2025, 11, 12, 15, 30)
+
+
+def day(value):
+    return f"{value}T00:00:00"
+
+
+@pytest.mark.parametrize("query, start, end", [
+    ("latest surveillance circulars", "2025-10-28", "2025-11-12"),
+    ("dividends in the next 3 days", "2025-11-13", "2025-11-17"),  # ends on Sunday the 16th
+    ("bonus issues next week", "2025-11-17", "2025-11-24"),
+    ("corporate actions next month", "2025-12-01", "2025-12-31"),
+    ("circulars from the last 10 days", "2025-11-02", "2025-11-12"),
+    ("circulars of the past week", "2025-11-05", "2025-11-12"),
+    ("previous month circulars", "2025-10-13", "2025-11-12"),
+    ("record dates this week", "2025-11-10", "2025-11-16"),
+    ("holidays this month", "2025-11-01", "2025-11-30"),
+])
+def test_ranges(query, start, end):
+    assert DateIntentParser(fallback=False).parse(query, today=TODAY) == {"start": day(start), "end": day(end), "exact": None}
+
+
+@pytest.mark.parametrize("query, exact", [
+    ("circulars issued today", "2025-11-12"),
+    ("ex-dates tomorrow", "2025-11-13"),
+    ("what was announced yesterday", "2025-11-11"),
+    ("circular dated 05-11-2025", "2025-11-05"),
+    ("circular dated 05/11/2025", "2025-11-05"),
+    ("circular dated 2025-11-05", "2025-11-05"),
+    ("circulars on 15 Nov", "2025-11-17"),  # Saturday
+    ("circulars on 3rd of december", "2025-12-03"),
+    ("circulars on Nov 14, 2025", "2025-11-14"),
+    ("circulars on Nov 14th", "2025-11-14"),
+])
+def test_exact_dates(query, exact):
+    assert DateIntentParser(fallback=False).parse(query, today=TODAY) == {"start": day(exact), "end": day(exact), "exact": day(exact)}
+
+
+@pytest.mark.parametrize("query", [
+    "circulars on 31 Feb 2025",
+    "circular dated 31-02-2025",
+    "may I know the margin rules",
+    "what is the march of the index",
+])
+def test_no_date(query):
+    assert DateIntentParser(fallback=False).parse(query, today=TODAY) == {"start": None, "end": None, "exact": None}
+
+
+class SearchDates:
+    """Stands in for dateparser.search.search_dates and records its calls."""
+    def __init__(self, found):
+        self.found = found
+        self.calls = []
+
+    def __call__(self, query):
+        self.calls.append(query)
+        return self.found
+
+
+def parser_with(found):
+    parser = DateIntentParser()
+    parser.search_dates = SearchDates(found)
+    return parser
+
+
+def test_fallback_for_dates_the_rules_miss():
+    parser = parser_with([("a week ago", dt(2025, 11, 5, 10, 0))])
+    assert parser.parse("circulars from a week ago", today=TODAY)["exact"] == day("2025-11-05")
+    assert parser.search_dates.calls == ["circulars from a week ago"]
+
+
+def test_fallback_finds_nothing():
+    parser = parser_with(None)
+    assert parser.parse("circulars on 31 Feb 2025", today=TODAY) == {"start": None, "end": None, "exact": None}
+    assert parser.search_dates.calls == ["circulars on 31 Feb 2025"]
+
+
+@pytest.mark.parametrize("query", [
+    "lot size revision for index options",
+    "may I know the margin rules",
+    "dividends in the next 3 days",
+])
+def test_fallback_skipped(query):
+    # Nothing date-like left for dateparser, or the rules already resolved it
+    parser = parser_with([("x", dt(2020, 1, 1))])
+    parser.parse(query, today=TODAY)
+    assert parser.search_dates.calls == []
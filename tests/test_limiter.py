@@ -0,0 +1,70 @@
+"""FairLimiter: bounded LLM slots, handed out round-robin across sessions."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.limiter import FairLimiter
+
+
+def granted(tickets):
+    return [name for name, ticket in tickets.items() if ticket.granted.is_set()]
+
+
+def test_grants_immediately_below_the_limit():
+    limiter = FairLimiter(max_concurrent=2)
+    first, second, third = (limiter.enqueue("a") for _ in range(3))
+    assert first.granted.is_set() and second.granted.is_set()
+    assert not third.granted.is_set()
+    assert limiter.stats()["active"] == 2 and limiter.stats()["queued"] == 1
+
+
+def test_freed_slots_go_round_robin_across_sessions():
+    limiter = FairLimiter(max_concurrent=1)
+    limiter.enqueue("a")
+    # Session a bursts three requests before b and c ask once each
+    tickets = {name: limiter.enqueue(name[0]) for name in ("a1", "a2", "a3", "b1", "c1")}
+
+    order = []
+    for _ in tickets:
+        before = set(granted(tickets))
+        limiter.release()
+        order.extend(set(granted(tickets)) - before)
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_position_interleaves_sessions():
+    limiter = FairLimiter(max_concurrent=1)
+    running = limiter.enqueue("a")
+    a1, a2, b1 = limiter.enqueue("a"), limiter.enqueue("a"), limiter.enqueue("b")
+    assert [t.position() for t in (running, a1, b1, a2)] == [0, 1, 2, 3]
+
+    limiter.release()
+    assert [t.position() for t in (a1, b1, a2)] == [0, 1, 2]
+
+
+def test_wait_timeout_removes_the_ticket():
+    limiter = FairLimiter(max_concurrent=1)
+    running = limiter.enqueue("a")
+    waiting = limiter.enqueue("b")
+
+    assert limiter.wait(running, timeout=0)
+    assert not limiter.wait(waiting, timeout=0.01)
+    assert limiter.stats()["queued"] == 0 and limiter.stats()["timeouts"] == 1
+    assert waiting.position() == 0
+
+    # The slot is not handed to the abandoned ticket
+    limiter.release()
+    assert not waiting.granted.is_set()
+    assert limiter.stats()["active"] == 0
+
+
+def test_stats_count_grants_and_queue_depth():
+    limiter = FairLimiter(max_concurrent=1)
+    limiter.enqueue("a")
+    for session in ("a", "b", "b"):
+        limiter.enqueue(session)
+    for _ in range(4):
+        limiter.release()
+    stats = limiter.stats()
+    assert stats["granted"] == 4 and stats["max_queued"] == 3
+    assert stats["active"] == 0 and stats["sessions_waiting"] == 0
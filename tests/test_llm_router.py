@@ -0,0 +1,90 @@
+"""
+LLMRouter ranking, hedging and cancellation against local StubLLMServer endpoints.
+
+Endpoints are listed slowest first, so the router only ends up on the fast one
+if the endpoints it hedges away from (and the ones it hasn't tried yet) are
+measured and ranked rather than left at their initial score. Stub latencies
+are far apart, so the assertions are on ranking and counts, not on timings.
+"""
+import threading
+import time
+import pytest
+
+pytest.importorskip("openai")
+
+from src.llm import LLMRouter, Endpoint
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def router_for(servers, hedge_after=None):
+    endpoints = [Endpoint(name, stub.base_url, "stub", "stub", timeout=10) for name, stub in servers.items()]
+    return LLMRouter(endpoints, hedge_after=hedge_after)
+
+
+def ask(router):
+    return "".join(event.choices[0].delta.content or "" for event in router.stream(MESSAGES) if event.choices)
+
+
+def names(router):
+    return [e.name for e in router.rank()]
+
+
+def test_hedge_losers_are_measured_and_fast_endpoint_wins(stub_llm):
+    servers = stub_llm(
+        slow={"ttft": 5, "tokens": 3},
+        steady={"ttft": 0.3, "tokens": 3},
+        fast={"ttft": 0, "tokens": 3},
+    )
+    router = router_for(servers, hedge_after=1.0)
+
+    for _ in range(6):
+        assert ask(router)
+
+    assert names(router) == ["fast", "steady", "slow"]
+    # Only the first request (slow endpoint first) needed a hedge; after it the fast one is tried and kept
+    assert router.hedges == 1 and router.failovers == 0
+    assert [servers[name].requests for name in ("slow", "steady", "fast")] == [1, 1, 5]
+    endpoints = router.stats()["endpoints"]
+    # Cancelled as the hedge loser, yet measured as slower than the winner, and not counted as a failure
+    assert endpoints["slow"]["ttft_p50_ms"] >= endpoints["steady"]["ttft_p50_ms"]
+    assert endpoints["slow"]["error_rate"] == 0.0
+
+
+def test_unmeasured_endpoint_is_tried_once(stub_llm):
+    servers = stub_llm(steady={"ttft": 0.3, "tokens": 3}, fast={"ttft": 0, "tokens": 3})
+    router = router_for(servers)
+
+    assert names(router) == ["steady", "fast"]
+    ask(router)
+    # Not measured yet: scored as the best measured endpoint, and tried ahead of it
+    assert names(router) == ["fast", "steady"]
+    ask(router)
+    ask(router)
+    assert names(router) == ["fast", "steady"]
+    assert servers["steady"].requests == 1 and servers["fast"].requests == 2
+
+
+def test_failing_endpoint_drops_back(stub_llm):
+    servers = stub_llm(broken={"fail_rate": 1.0}, steady={"ttft": 0, "tokens": 3})
+    router = router_for(servers)
+
+    for _ in range(3):
+        assert ask(router)
+    # Never produced a token, but its errors outweigh the probe score
+    assert names(router) == ["steady", "broken"]
+    assert router.failovers == 1 and servers["broken"].requests == 1
+
+
+def test_cancelled_loser_stream_is_closed(stub_llm):
+    servers = stub_llm(stalled={"ttft": 30, "tokens": 3}, fast={"ttft": 0, "tokens": 3})
+    router = router_for(servers, hedge_after=0.2)
+
+    assert ask(router)
+    # The stalled stream is closed by the router, not left open until the stub answers or LLM_TIMEOUT
+    deadline = time.monotonic() + 5
+    while any(t.name == "llm-stalled" for t in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not any(t.name == "llm-stalled" for t in threading.enumerate())
+    assert router.hedges == 1
+    assert names(router) == ["fast", "stalled"]
@@ -0,0 +1,62 @@
+"""ConversationMemory: history stays within its token budget however long the conversation gets."""
+import pytest
+
+from src.context import count_tokens
+from src.memory import ConversationMemory, MAX_ANSWER_TOKENS
+
+
+def turn(n):
+    return [
+        {"role": "user", "content": f"What is the ex-date of the dividend declared by SYM{n}?"},
+        {"role": "assistant", "content": f"The ex-date for SYM{n} is 2025-11-{n % 28 + 1:02d}. " * 20},
+    ]
+
+
+def tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages)
+
+
+@pytest.mark.parametrize("turns", [1, 3, 10, 50])
+def test_history_stays_within_budget(turns):
+    memory = ConversationMemory(budget=600)
+    history = [m for n in range(turns) for m in turn(n)]
+
+    messages = memory.messages(history)
+
+    assert tokens(messages) <= 600
+    assert messages[-1]["content"].startswith(f"The ex-date for SYM{turns - 1}")
+
+
+def test_older_turns_are_summarised():
+    memory = ConversationMemory(budget=600)
+    history = [m for n in range(10) for m in turn(n)]
+
+    summary = memory.messages(history)[0]
+
+    assert summary["role"] == "user"
+    assert summary["content"].startswith("Summary of the earlier conversation:")
+    assert "SYM0" in summary["content"]
+
+
+def test_current_question_is_dropped_from_the_end():
+    memory = ConversationMemory(budget=600)
+    query = "And its record date?"
+    history = turn(1) + [{"role": "user", "content": query}]
+
+    assert memory.messages(history, query) == memory.messages(turn(1))
+    assert memory.messages(history, query)[-1]["role"] == "assistant"
+    # Only the trailing copy is the current question
+    assert memory.messages(history, "something else")[-1]["content"] == query
+
+
+def test_long_answer_is_clipped_inside_the_line():
+    # Answers are often one long paragraph; clipping must keep its start, not drop it
+    answer = " ".join(f"Clause {n} of the circular applies to all trading members." for n in range(50))
+    memory = ConversationMemory(budget=2000)
+
+    clipped = memory.clip(answer)
+
+    assert clipped.endswith("\n[...]")
+    assert answer.startswith(clipped[:-len("\n[...]")])
+    assert MAX_ANSWER_TOKENS - 20 <= count_tokens(clipped) <= MAX_ANSWER_TOKENS + 5
+    assert memory.messages([{"role": "user", "content": "q"}, {"role": "assistant", "content": answer}])[-1]["content"] == clipped
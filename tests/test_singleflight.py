@@ -0,0 +1,90 @@
+"""SingleFlight: identical concurrent requests share one producer and all get its whole stream."""
+import threading
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+class Producer:
+    """Yields "a", then waits for `release` before yielding the rest (or raising `error`)."""
+    def __init__(self, error=None):
+        self.release = threading.Event()
+        self.error = error
+        self.runs = 0
+
+    def __call__(self, flight):
+        self.runs += 1
+        yield "a"
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        yield "b"
+        yield "c"
+
+
+def test_late_subscriber_gets_the_whole_stream():
+    flights, producer = SingleFlight(), Producer()
+    first = flights.stream("key", producer)
+    assert next(first) == "a"
+
+    # Joins after "a" was produced
+    late = flights.stream("key", producer)
+    producer.release.set()
+
+    assert ["a"] + list(first) == ["a", "b", "c"]
+    assert list(late) == ["a", "b", "c"]
+    assert producer.runs == 1
+    assert flights.stats() == {"started": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_producer_error_reaches_every_subscriber():
+    flights, producer = SingleFlight(), Producer(error=RuntimeError("LLM failed"))
+    subscribers = [flights.stream("key", producer) for _ in range(3)]
+    received = [[next(s)] for s in subscribers]
+    producer.release.set()
+
+    for subscriber, chunks in zip(subscribers, received):
+        with pytest.raises(RuntimeError, match="LLM failed"):
+            chunks.extend(subscriber)
+        assert chunks == ["a"]
+
+
+def test_finished_flight_is_not_reused():
+    flights, producer = SingleFlight(), Producer()
+    producer.release.set()
+    assert list(flights.stream("key", producer)) == ["a", "b", "c"]
+    assert list(flights.stream("key", producer)) == ["a", "b", "c"]
+    assert producer.runs == 2
+
+
+def test_different_keys_do_not_share():
+    flights, producer = SingleFlight(), Producer()
+    producer.release.set()
+    streams = [flights.stream(key, producer) for key in ("one", "two")]
+    assert [list(s) for s in streams] == [["a", "b", "c"]] * 2
+    assert flights.stats()["coalesced"] == 0
+
+
+def test_subscribers_see_the_queue_position_while_waiting():
+    class Ticket:
+        def position(self):
+            return 3
+
+    flights, started, release = SingleFlight(), threading.Event(), threading.Event()
+
+    def producer(flight):
+        flight.ticket = Ticket()
+        started.set()
+        assert release.wait(5)
+        yield "answer"
+
+    positions = []
+
+    def on_wait(position):
+        positions.append(position)
+        release.set()
+
+    stream = flights.stream("key", producer, on_wait=on_wait)
+    assert started.wait(5)
+    assert list(stream) == ["answer"]
+    assert positions and set(positions) == {3}